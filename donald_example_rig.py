@@ -1,7 +1,6 @@
 # --- This is the complete and unified script for your rig UI and tools ---
 import bpy
-from mathutils import Matrix, Vector, Quaternion
-from rigging_tools import draw_collection_button, draw_collapsible_box
+from rigging_tools import RigUIPanel, register_ik_snap, register_snap_chain
 
 #----------------------------
 # Dependencies
@@ -14,160 +13,105 @@ from rigging_tools import draw_collection_button, draw_collapsible_box
 armature_name = "donald-armature"
 
 
+# --- Snap Specs ---
+# Declared once here, then resolved and validated against the armature by rigging_tools.
+register_snap_chain("donald.arm_fk.L",
+                    source_bones=("mch_ik_arm.L", "mch_ik_forearm.L", "hand_ik.L"),
+                    target_bones=("arm_fk.L", "forearm_fk.L", "hand_fk.L"))
+register_snap_chain("donald.arm_fk.R",
+                    source_bones=("mch_ik_arm.R", "mch_ik_forearm.R", "hand_ik.R"),
+                    target_bones=("arm_fk.R", "forearm_fk.R", "hand_fk.R"))
+register_ik_snap("donald.arm_ik.L", ik_control_bone="hand_ik.L", pole_control_bone="pole_arm.L",
+                 source_end_bone="hand_fk.L", source_chain_root="arm_fk.L", source_chain_pivot="forearm_fk.L",
+                 ik_chain=("mch_ik_arm.L", "mch_ik_forearm.L", "hand_ik.L"))
+register_ik_snap("donald.arm_ik.R", ik_control_bone="hand_ik.R", pole_control_bone="pole_arm.R",
+                 source_end_bone="hand_fk.R", source_chain_root="arm_fk.R", source_chain_pivot="forearm_fk.R",
+                 ik_chain=("mch_ik_arm.R", "mch_ik_forearm.R", "hand_ik.R"))
+register_snap_chain("donald.tail_fk",
+                    source_bones=("tail_01_ik", "tail_02_ik"),
+                    target_bones=("tail_01_fk", "tail_02_fk"))
+register_snap_chain("donald.tail_ik",
+                    source_bones=("tail_01_fk", "tail_02_fk"),
+                    target_bones=("tail_01_ik", "tail_02_ik"))
+register_snap_chain("donald.leg_fk.L",
+                    source_bones=("mch_thigh_ik.L", "mch_shin_ik.L", "foot_ik_master.L"),
+                    target_bones=("thigh_fk.L", "shin_fk.L", "foot_fk.L"))
+register_snap_chain("donald.leg_fk.R",
+                    source_bones=("mch_thigh_ik.R", "mch_shin_ik.R", "foot_ik_master.R"),
+                    target_bones=("thigh_fk.R", "shin_fk.R", "foot_fk.R"))
+register_snap_chain("donald.leg_ik.L", source_bones=("foot_fk.L",), target_bones=("foot_ik_master.L",))
+register_snap_chain("donald.leg_ik.R", source_bones=("foot_fk.R",), target_bones=("foot_ik_master.R",))
+
+
 
 
 ######################################################################################
 # Main UI Panel
 ######################################################################################
-class DONALDRIG_PT_rigui(bpy.types.Panel):
-    bl_space_type = 'VIEW_3D'
-    bl_region_type = 'UI'
-    bl_category = 'Item'
+# Declared once; rigging_tools compiles it against the armature and replays it on each redraw.
+def _sided(name):
+    return [{"collection": f"{name}_L", "solo": True}, {"collection": f"{name}_R", "solo": True}]
+
+rig_ui_spec = {"boxes": [
+    {"id": "donald_core_expanded", "text": "Core", "icon": 'MOD_ARMATURE', "rows": [
+        [{"collection": "root_props", "text": "Root & props"}],
+        [{"collection": "def"}, {"collection": "org"}, {"collection": "mch"}, {"collection": "tweaks"}],
+    ]},
+    {"id": "donald_body_visibility", "text": "Body Visibility", "icon": 'ARMATURE_DATA', "rows": [
+        _sided("shoulder"),
+        _sided("arm_fk"),
+        _sided("arm_ik"),
+        _sided("hand"),
+        [{"collection": "finger_tips", "solo": True}],
+        [{"collection": "tail_fk", "solo": True}, {"collection": "tail_ik", "solo": True}],
+        _sided("leg_fk"),
+        _sided("leg_ik"),
+        _sided("foot"),
+        [{"collection": "toe_tips", "solo": True}],
+    ]},
+    {"id": "donald_visibility_presets", "text": "Visibility Presets", "icon": 'HIDE_OFF', "rows": [
+        [{"draw": "visibility_presets"}],
+    ]},
+    {"id": "donald_snapping", "text": "Snapping", "icon": 'SNAP_ON', "rows": [
+        # --- Arm Snapping ---
+        [{"snap": "donald.arm_fk.L", "text": "Arm L < FK"}, {"snap": "donald.arm_fk.R", "text": "Arm R < FK"}],
+        [{"snap": "donald.arm_ik.L", "text": "Arm L < IK"}, {"snap": "donald.arm_ik.R", "text": "Arm R < IK"}],
+        [{"snap": "donald.arm_fk.L", "text": "Arms < FK", "symmetric": True},
+         {"snap": "donald.arm_ik.L", "text": "Arms < IK", "symmetric": True},
+         {"snap": "donald.arm_ik.L", "text": "Arms < IK (Exact)", "symmetric": True, "converge": True}],
+        # --- Tail Snapping ---
+        [{"snap": "donald.tail_fk", "text": "Tail < FK"}, {"snap": "donald.tail_ik", "text": "Tail < IK"}],
+        # --- Leg Snapping ---
+        [{"snap": "donald.leg_fk.L", "text": "Leg L < FK"}, {"snap": "donald.leg_fk.R", "text": "Leg R < FK"}],
+        [{"snap": "donald.leg_ik.L", "text": "Leg L < IK"}, {"snap": "donald.leg_ik.R", "text": "Leg R < IK"}],
+        [{"snap": "donald.leg_fk.L", "text": "Legs < FK", "symmetric": True},
+         {"snap": "donald.leg_ik.L", "text": "Legs < IK", "symmetric": True}],
+    ]},
+    {"id": "donald_properties", "text": "Rig Properties", "icon": 'PROPERTIES', "rows": [
+        [{"property": "arm_fk_ik.L", "text": "Arm FK/IK L"}],
+        [{"property": "arm_fk_ik.R", "text": "Arm FK/IK R"}],
+        [{"property": "arm_follow.L", "text": "Arm Follow L"}],
+        [{"property": "arm_follow.R", "text": "Arm Follow R"}],
+        [{"property": "tail_fk_ik", "text": "Tail FK/IK"}],
+        [{"property": "leg_fk_ik_L", "text": "Leg FK/IK L"}],
+        [{"property": "leg_fk_ik_R", "text": "Leg FK/IK R"}],
+    ]},
+    {"id": "donald_debug", "text": "Debug Tools", "icon": 'TOOL_SETTINGS', "expanded": False, "rows": [
+        [{"draw": "validation"}],
+        [{"operator": "debug.dissect_bone_matrix", "icon": 'CONSOLE'}],
+        [{"operator": "debug.dump_rig_transforms", "icon": 'EXPORT'}],
+        [{"draw": "profiling"}],
+        [{"draw": "matrix_cache"}],
+    ]},
+]}
+
+
+class DONALDRIG_PT_rigui(RigUIPanel, bpy.types.Panel):
     bl_label = "Rig UI"
     bl_idname = "DONALDRIG_PT_rigui"
 
-    @classmethod
-    def poll(self, context):
-        return (context.active_object and context.active_object.type == 'ARMATURE' and 
-                context.active_object.name == armature_name)
-
-    def draw(self, context):
-        layout = self.layout
-        rig = context.active_object
-
-        #-------------------------
-        # Core layer 
-        #-------------------------
-        col = draw_collapsible_box(layout, context, "donald_core_expanded", "Core", icon='MOD_ARMATURE')
-        if col:
-            row = col.row(align=True)
-            draw_collection_button(row, "root_props", text="Root & props")
-            row = col.row(align=True)
-            draw_collection_button(row, "def")
-            draw_collection_button(row, "org")
-            draw_collection_button(row, "mch")
-            draw_collection_button(row, "tweaks")     
-        
-        
-        #-------------------------
-        # Body visibility
-        #-------------------------        
-        col = draw_collapsible_box(layout, context, "donald_body_visibility", "Body Visibility", icon='ARMATURE_DATA')
-        if col:        
-            row = col.row(align = True)  
-            draw_collection_button(row, "shoulder_L", show_solo_button=True)
-            draw_collection_button(row, "shoulder_R", show_solo_button=True)
-            row = col.row(align = True)  
-            draw_collection_button(row, "arm_fk_L", show_solo_button=True)
-            draw_collection_button(row, "arm_fk_R", show_solo_button=True)
-            row = col.row(align = True)  
-            draw_collection_button(row, "arm_ik_L", show_solo_button=True)
-            draw_collection_button(row, "arm_ik_R", show_solo_button=True)
-            row = col.row(align = True)  
-            draw_collection_button(row, "hand_L", show_solo_button=True)
-            draw_collection_button(row, "hand_R", show_solo_button=True)
-            row = col.row(align = True)  
-            draw_collection_button(row, "finger_tips", show_solo_button=True)
-            row = col.row(align = True)  
-            draw_collection_button(row, "tail_fk", show_solo_button=True)
-            draw_collection_button(row, "tail_ik", show_solo_button=True)
-            row = col.row(align = True)          
-            draw_collection_button(row, "leg_fk_L", show_solo_button=True)
-            draw_collection_button(row, "leg_fk_R", show_solo_button=True)
-            row = col.row(align = True)  
-            draw_collection_button(row, "leg_ik_L", show_solo_button=True)
-            draw_collection_button(row, "leg_ik_R", show_solo_button=True)
-            row = col.row(align = True)  
-            draw_collection_button(row, "foot_L", show_solo_button=True)
-            draw_collection_button(row, "foot_R", show_solo_button=True)
-            row = col.row(align = True)  
-            draw_collection_button(row, "toe_tips", show_solo_button=True)
-
-        #-------------------------
-        # Snapping
-        #-------------------------
-        col = draw_collapsible_box(layout, context, "donald_snapping", "Snapping", icon='SNAP_ON')
-        if col:                
-            # --- Arm Snapping ---
-            row = col.row(align=True)
-            op_to_fk = row.operator("rig.snap_bone_chain", text="Arm L < FK")
-            op_to_fk.source_bones = "mch_ik_arm.L, mch_ik_forearm.L, hand_ik.L"
-            op_to_fk.target_bones = "arm_fk.L, forearm_fk.L, hand_fk.L"
-            
-            op_to_fk = row.operator("rig.snap_bone_chain", text="Arm R < FK")
-            op_to_fk.source_bones = "mch_ik_arm.R, mch_ik_forearm.R, hand_ik.R" 
-            op_to_fk.target_bones = "arm_fk.R, forearm_fk.R, hand_fk.R"        
-            
-            
-            row = col.row(align=True)
-            op_to_ik_arm_L = row.operator("rig.snap_to_ik_with_pole", text="Arm L < IK")
-            op_to_ik_arm_L.ik_control_bone = "hand_ik.L"
-            op_to_ik_arm_L.pole_control_bone = "pole_arm.L"
-            op_to_ik_arm_L.source_end_bone = "hand_fk.L"
-            op_to_ik_arm_L.source_chain_root = "arm_fk.L"
-            op_to_ik_arm_L.source_chain_pivot = "forearm_fk.L"
-            
-            op_to_ik_arm_R = row.operator("rig.snap_to_ik_with_pole", text="Arm R < IK")
-            op_to_ik_arm_R.ik_control_bone = "hand_ik.R"
-            op_to_ik_arm_R.pole_control_bone = "pole_arm.R"
-            op_to_ik_arm_R.source_end_bone = "hand_fk.R"
-            op_to_ik_arm_R.source_chain_root = "arm_fk.R"
-            op_to_ik_arm_R.source_chain_pivot = "forearm_fk.R"    
-            
-            # --- Tail Snapping ---
-            row = col.row(align=True)
-            op_to_fk = row.operator("rig.snap_bone_chain", text="Tail < FK")
-            op_to_fk.source_bones = "tail_01_ik, tail_02_ik"
-            op_to_fk.target_bones = "tail_01_fk, tail_02_fk"           
-            
-            op_to_ik = row.operator("rig.snap_bone_chain", text="Tail < IK")
-            op_to_ik.source_bones = "tail_01_fk, tail_02_fk"
-            op_to_ik.target_bones = "tail_01_ik, tail_02_ik"          
-
-            # --- Leg Snapping ---
-            row = col.row(align=True)
-            op_to_fk = row.operator("rig.snap_bone_chain", text="Leg L < FK")
-            op_to_fk.source_bones = "mch_thigh_ik.L, mch_shin_ik.L, foot_ik_master.L"
-            op_to_fk.target_bones = "thigh_fk.L, shin_fk.L, foot_fk.L"
-            
-            op_to_fk = row.operator("rig.snap_bone_chain", text="Leg R < FK")
-            op_to_fk.source_bones = "mch_thigh_ik.R, mch_shin_ik.R, foot_ik_master.R"
-            op_to_fk.target_bones = "thigh_fk.R, shin_fk.R, foot_fk.R"        
-
-            row = col.row(align=True)
-            op_to_ik = row.operator("rig.snap_bone_chain", text="Leg L < IK")
-            op_to_ik.source_bones = "foot_fk.L" 
-            op_to_ik.target_bones = "foot_ik_master.L"
-         
-            op_to_ik = row.operator("rig.snap_bone_chain", text="Leg R < IK")
-            op_to_ik.source_bones = "foot_fk.R" 
-            op_to_ik.target_bones = "foot_ik_master.R"     
-        
-        
-        
-        #-------------------------
-        # Properties
-        #-------------------------     
-        col = draw_collapsible_box(layout, context, "donald_properties", "Rig Properties", icon='PROPERTIES')
-        if col:  
-            # First, get a reference to the 'properties' bone, if it exists
-            properties_bone = rig.pose.bones.get("properties")
-            
-            if properties_bone:
-                col.prop(properties_bone, '["arm_fk_ik.L"]', text="Arm FK/IK L", slider=True)
-                col.prop(properties_bone, '["arm_fk_ik.R"]', text="Arm FK/IK R", slider=True)
-                col.prop(properties_bone, '["arm_follow.L"]', text="Arm Follow L", slider=True)        
-                col.prop(properties_bone, '["arm_follow.R"]', text="Arm Follow R", slider=True)        
-                col.prop(properties_bone, '["tail_fk_ik"]', text="Tail FK/IK", slider=True)
-                col.prop(properties_bone, '["leg_fk_ik_L"]', text="Leg FK/IK L", slider=True)
-                col.prop(properties_bone, '["leg_fk_ik_R"]', text="Leg FK/IK R", slider=True)
-
-        #-------------------------
-        # Debug
-        #-------------------------
-        col = draw_collapsible_box(layout, context, "donald_debug", "Debug Tools", icon='TOOL_SETTINGS', default_expanded=False)
-        if col:
-            col.operator("debug.dissect_bone_matrix", icon='CONSOLE')        
+    rig_armature_name = armature_name
+    rig_ui_spec = rig_ui_spec
         
         
 ######################################################################################
@@ -178,13 +122,18 @@ classes = (
 )
 
 
-# This function runs once when the script is registered
+# This function runs once when the script is registered.
+# Render and farm nodes run without a UI, so the panel is skipped there; the snap specs above still work.
 def register(): 
+    if bpy.app.background:
+        return
     for cls in classes:
         bpy.utils.register_class(cls)
 
 # This function runs once when the script is unregistered
 def unregister():
+    if bpy.app.background:
+        return
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
         
@@ -0,0 +1,217 @@
+# rigging_benchmarks.py
+#
+# Timings and cross-checks of rigging_tools inside Blender, kept out of the add-on so that
+# importing it (on every render and farm node) doesn't pay for them. Run them from the
+# Python console, e.g.
+#   import rigging_benchmarks
+#   rigging_benchmarks.benchmark_bake_snap(C.scene, C.object, [...], [...])
+# The bpy-free math has its own benchmarks in rigging_core.py and tests/.
+
+import json
+import time
+from contextlib import contextmanager
+
+import bpy
+import numpy as np
+
+from rigging_core import are_matrices_fuzzy_equal, matrices_fuzzy_equal_batch
+from rigging_tools import (_solve_bone_chain, bake_snap, batch_snap, capture_pose, copy_bone_chain,
+                           enable_source_matrix_cache, get_source_matrix_cache, invalidate_source_matrix_cache,
+                           is_source_matrix_cache_enabled, resolve_snap_spec, solve_snap_plans,
+                           validate_rig_panels, write_keyframes)
+
+@contextmanager
+def _benchmark_armature_copies(scene, armature_obj, count=1):
+    """
+    Yields `count` temporary copies of an armature, each with its own copy of the action,
+    so benchmarks can key and pose freely. Everything is removed afterwards.
+    """
+    copies = []
+    try:
+        for _ in range(count):
+            copy = armature_obj.copy()
+            if copy.animation_data and copy.animation_data.action:
+                copy.animation_data.action = copy.animation_data.action.copy()
+            scene.collection.objects.link(copy)
+            copies.append(copy)
+        yield copies
+    finally:
+        for copy in copies:
+            action = copy.animation_data.action if copy.animation_data else None
+            bpy.data.objects.remove(copy)
+            if action is not None and action.users == 0:
+                bpy.data.actions.remove(action)
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {module_dir!r})
+start = time.perf_counter()
+import rigging_tools
+imported = time.perf_counter()
+rigging_tools.register(ui={ui!r})
+registered = time.perf_counter()
+numpy_loaded = "numpy" in sys.modules
+rigging_tools.unregister()
+print("STARTUP " + json.dumps({{"import": imported - start, "register": registered - imported,
+                                "numpy": numpy_loaded}}))
+"""
+
+def benchmark_startup(blender_binary=None, repeat=5):
+    """
+    Times `import rigging_tools` and register() in fresh Blender processes, once with the background
+    (data only) registration and once with the full interactive one. Both run under `--background`:
+    "interactive" only means register(ui=True), so no window, UI drawing or startup file is involved.
+    Also reports whether NumPy got imported along the way, which it shouldn't be until a snap runs.
+    Returns {"background": {"import": s, "register": s, "numpy": bool}, "interactive": {...}}, best of `repeat`.
+    """
+    import os
+    import subprocess
+
+    blender_binary = blender_binary or bpy.app.binary_path
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for mode, ui in (("background", False), ("interactive", True)):
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [blender_binary, "--background", "--factory-startup", "--python-expr",
+                 _STARTUP_SCRIPT.format(module_dir=module_dir, ui=ui)],
+                capture_output=True, text=True, check=True).stdout
+            line = next(line for line in output.splitlines() if line.startswith("STARTUP "))
+            runs.append(json.loads(line[len("STARTUP "):]))
+        results[mode] = {key: min(run[key] for run in runs) for key in ("import", "register")}
+        results[mode]["numpy"] = any(run["numpy"] for run in runs)
+        print(f"{mode}: import {results[mode]['import'] * 1e3:.1f} ms, "
+              f"register {results[mode]['register'] * 1e3:.1f} ms, "
+              f"numpy {'loaded' if results[mode]['numpy'] else 'not loaded'}")
+    return results
+
+def benchmark_bake_snap(scene, armature_obj, source_names, target_names, frame_count=1000):
+    """Bakes a chain snap over a synthetic `frame_count` frame range on a copy of the rig and reports frames per second."""
+    frames = range(1, frame_count + 1)
+    with _benchmark_armature_copies(scene, armature_obj) as (rig,):
+        start = time.perf_counter()
+        bake_snap(scene, rig, frames, lambda r: _solve_bone_chain(source_names, target_names, r))
+        elapsed = time.perf_counter() - start
+    fps = frame_count / elapsed if elapsed else float('inf')
+    print(f"bake_snap: {frame_count} frames in {elapsed:.3f}s ({fps:.1f} frames/s)")
+    return fps
+
+def compare_chain_snap_paths(scene, armature_obj, source_names, target_names, tolerance=0.0001):
+    """
+    Snaps a chain on two copies of the rig, one with the analytic single-update path and one with the
+    legacy per-bone updates, and checks the target pose matrices agree within `tolerance`
+    (matrices_fuzzy_equal_batch). Returns the names of the targets that differ and the timing of both paths.
+    """
+    with _benchmark_armature_copies(scene, armature_obj, count=2) as (analytic, per_bone):
+        timings = {}
+        for label, rig, per_bone_update in (("analytic", analytic, False), ("per_bone", per_bone, True)):
+            start = time.perf_counter()
+            copy_bone_chain(source_names, target_names, rig, per_bone_update=per_bone_update, skip_unchanged=False)
+            timings[label] = time.perf_counter() - start
+        bpy.context.view_layer.update()
+        targets = [name for name in target_names if name in analytic.pose.bones]
+        matrices_a = np.array([analytic.pose.bones[name].matrix for name in targets])
+        matrices_b = np.array([per_bone.pose.bones[name].matrix for name in targets])
+        equal = matrices_fuzzy_equal_batch(matrices_a, matrices_b, tolerance)
+    mismatched = [name for name, ok in zip(targets, equal) if not ok]
+    print(f"chain snap: analytic {timings['analytic'] * 1e3:.2f} ms, per-bone {timings['per_bone'] * 1e3:.2f} ms, "
+          f"{len(targets) - len(mismatched)}/{len(targets)} targets within {tolerance}")
+    return mismatched, timings
+
+def benchmark_source_matrix_cache(scene, armature_obj, spec_name, frame_count=250):
+    """Bakes a snap spec twice over the same frames with the source matrix cache on, and times both passes."""
+    was_enabled = is_source_matrix_cache_enabled()
+    enable_source_matrix_cache(True)
+    frames = range(scene.frame_start, scene.frame_start + frame_count)
+    try:
+        with _benchmark_armature_copies(scene, armature_obj) as (rig,):
+            plans = [resolve_snap_spec(rig, spec_name)]
+            timings = []
+            for _ in range(2):
+                start = time.perf_counter()
+                bake_snap(scene, rig, frames, lambda r, matrices=None: solve_snap_plans(r, plans, matrices),
+                          cache=get_source_matrix_cache(rig, plans))
+                timings.append(time.perf_counter() - start)
+            invalidate_source_matrix_cache(rig)
+    finally:
+        enable_source_matrix_cache(was_enabled)
+    print(f"bake_snap '{spec_name}', {frame_count} frames: first pass {timings[0]:.3f}s, "
+          f"cached pass {timings[1]:.3f}s ({timings[0] / max(timings[1], 1e-9):.1f}x)")
+    return timings
+
+def benchmark_validate_rig(armature_obj, repeat=20):
+    """Times validate_rig_panels on an armature, e.g. a production rig with thousands of bones."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        report = validate_rig_panels(armature_obj)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"validate_rig: {report.counts['bones']} bones, {len(report.issues)} issue(s), "
+          f"median {timings[len(timings) // 2] * 1e3:.2f} ms")
+    return timings
+
+def benchmark_keyframe_writer(scene, armature_obj, bone_names, key_count=10000):
+    """Keys `key_count` location keys spread over the given bones with keyframe_insert, then with write_keyframes."""
+    frame_count = max(key_count // (3 * len(bone_names)), 1)
+    frames = range(1, frame_count + 1)
+
+    with _benchmark_armature_copies(scene, armature_obj, count=2) as (rig_insert, rig_bulk):
+        start = time.perf_counter()
+        for frame in frames:
+            for name in bone_names:
+                rig_insert.pose.bones[name].keyframe_insert("location", frame=frame, group=name)
+        insert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        keys = {(name, "location"): (frames, [tuple(rig_bulk.pose.bones[name].location)] * frame_count)
+                for name in bone_names}
+        written = write_keyframes(rig_bulk, keys)
+        bulk_time = time.perf_counter() - start
+
+    print(f"{written} keys: keyframe_insert {insert_time:.3f}s, write_keyframes {bulk_time:.3f}s "
+          f"({insert_time / bulk_time:.1f}x)")
+    return insert_time, bulk_time
+
+def benchmark_batch_snap(scene, armature_obj, spec_name, counts=(1, 10, 50, 100, 200)):
+    """
+    Snaps a spec on growing numbers of rig copies, batched and one rig at a time.
+    Both passes write every bone, even the ones an earlier pass already snapped into place,
+    so they time real writes plus one (batched) or `count` (one by one) view layer updates.
+    """
+    results = []
+    with _benchmark_armature_copies(scene, armature_obj, count=max(counts)) as rigs:
+        for count in counts:
+            start = time.perf_counter()
+            batch_snap(rigs[:count], spec_name, skip_unchanged=False)
+            batched = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for rig in rigs[:count]:
+                resolve_snap_spec(rig, spec_name).run(rig, skip_unchanged=False)
+            one_by_one = time.perf_counter() - start
+
+            print(f"batch snap, {count:>3} armatures: batched {batched * 1e3:.1f}ms, "
+                  f"one by one {one_by_one * 1e3:.1f}ms")
+            results.append((count, batched, one_by_one))
+    return results
+
+def benchmark_pose_compare(armature_obj, repeat=100):
+    """Compares the whole pose against itself with the per-bone Python loop and with snapshots."""
+    pose_bones = armature_obj.pose.bones
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        all(are_matrices_fuzzy_equal(pbone.matrix, pbone.matrix) for pbone in pose_bones)
+    loop_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        snapshot = capture_pose(armature_obj)
+        matrices_fuzzy_equal_batch(snapshot.matrix, snapshot.matrix).all()
+    snapshot_time = (time.perf_counter() - start) / repeat
+
+    print(f"pose compare, {len(pose_bones)} bones: python loop {loop_time * 1e6:.1f}us, "
+          f"snapshot {snapshot_time * 1e6:.1f}us ({loop_time / snapshot_time:.1f}x)")
+    return loop_time, snapshot_time
@@ -0,0 +1,633 @@
+# rigging_core.py
+#
+# The math behind rigging_tools, written against plain NumPy arrays so it can be
+# profiled and regression-tested without Blender. Nothing in here imports bpy or
+# mathutils: rigging_tools converts pose bones to arrays and back.
+#
+# Conventions:
+#   - Matrices are 4x4, row-major like mathutils (matrix[row][col]), translation in the last column.
+#   - "rest" is a bone's bone.matrix_local, "pose" its pose_bone.matrix (armature space),
+#     "basis" its pose_bone.matrix_basis.
+#   - Every function accepts a single matrix/vector or a stack of them (..., 4, 4) / (..., 3).
+#
+# Run `python rigging_core.py` for the synthetic-armature benchmarks, or
+# `python rigging_core.py diff a.rigdump b.rigdump` to compare two transform dumps.
+
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+#============================================================
+#  MATRIX OFFSETS
+#============================================================
+def snap_offset(source_rest, target_rest):
+    """The rest offset between two bones: source_rest^-1 @ target_rest."""
+    return np.linalg.inv(source_rest) @ target_rest
+
+def snap_matrix(source_pose, source_rest, target_rest):
+    """The pose matrix that puts the target bone onto the source bone, keeping their rest offset."""
+    return np.asarray(source_pose) @ snap_offset(source_rest, target_rest)
+
+def pose_to_basis(pose, rest, parent_pose=None, parent_rest=None):
+    """
+    Converts pose matrices to basis matrices for bones with full inheritance
+    (pose = parent_pose @ parent_rest^-1 @ rest @ basis). Pass no parent for root bones.
+    """
+    if parent_pose is None:
+        return np.linalg.inv(rest) @ pose
+    return np.linalg.inv(parent_pose @ np.linalg.inv(parent_rest) @ rest) @ pose
+
+def basis_to_pose(basis, rest, parent_pose=None, parent_rest=None):
+    """Inverse of pose_to_basis."""
+    if parent_pose is None:
+        return np.asarray(rest) @ basis
+    return parent_pose @ np.linalg.inv(parent_rest) @ rest @ basis
+
+def forward_kinematics(parents, rest, basis):
+    """
+    Pose matrices of a whole hierarchy with full inheritance.
+    `parents[i]` is the index of bone i's parent (-1 for roots); parents must come before their children.
+    Bones are solved one depth level at a time, so the Python loop runs once per level, not per bone.
+    """
+    parents = np.asarray(parents)
+    has_parent = parents >= 0
+    local = np.array(rest, dtype=np.float64)
+    local[has_parent] = np.linalg.inv(local[parents[has_parent]]) @ local[has_parent]
+    local = local @ basis
+
+    depth = np.zeros(len(parents), dtype=np.intp)
+    for i in np.flatnonzero(has_parent):
+        depth[i] = depth[parents[i]] + 1
+
+    pose = np.empty_like(local)
+    for level in range(depth.max() + 1 if len(depth) else 0):
+        idx = np.flatnonzero(depth == level)
+        if level == 0:
+            pose[idx] = local[idx]
+        else:
+            pose[idx] = pose[parents[idx]] @ local[idx]
+    return pose
+
+#============================================================
+#  POLE VECTORS
+#============================================================
+def pole_positions(roots, pivots, ends, fallback='pivot', epsilon=1e-6):
+    """
+    Solves the pole target of N chains (frames, limbs or characters) in one pass.
+    `roots`, `pivots` and `ends` are (N, 3) head positions. Each pole is placed away from the
+    root-end line, through the pivot, at the distance of the root-pivot bone.
+
+    A chain is degenerate when it is straight (its pole vector is shorter than `epsilon`
+    times the root-pivot length) and has no bend direction. `fallback` decides where its pole goes:
+      - 'pivot': on the pivot itself,
+      - 'hold':  along the direction of the previous non-degenerate row (for frame sequences),
+                 or on the pivot if there is none,
+      - a (3,) or (N, 3) array: along that direction.
+
+    Returns the (N, 3) pole positions and the (N,) degenerate mask.
+    """
+    roots, pivots, ends = (np.atleast_2d(np.asarray(v, dtype=np.float64)) for v in (roots, pivots, ends))
+    axes = ends - roots
+    axis_length_sq = np.einsum('ij,ij->i', axes, axes)
+    safe_length_sq = np.where(axis_length_sq > 0.0, axis_length_sq, 1.0)
+    factors = np.where(axis_length_sq > 0.0, np.einsum('ij,ij->i', pivots - roots, axes) / safe_length_sq, 0.0)
+    pole_vectors = pivots - (roots + axes * factors[:, None])
+
+    pole_lengths = np.linalg.norm(pole_vectors, axis=1)
+    distances = np.linalg.norm(pivots - roots, axis=1)
+    degenerate = pole_lengths <= epsilon * np.maximum(distances, epsilon)
+    directions = pole_vectors / np.where(degenerate, 1.0, pole_lengths)[:, None]
+    directions[degenerate] = 0.0
+
+    if degenerate.any():
+        if isinstance(fallback, str) and fallback == 'hold':
+            valid = np.where(degenerate, -1, np.arange(len(degenerate)))
+            source = np.maximum.accumulate(valid)
+            held = degenerate & (source >= 0)
+            directions[held] = directions[source[held]]
+        elif not isinstance(fallback, str):
+            fallback = np.broadcast_to(np.asarray(fallback, dtype=np.float64), directions.shape)
+            lengths = np.linalg.norm(fallback, axis=1)
+            usable = degenerate & (lengths > 0.0)
+            directions[usable] = fallback[usable] / lengths[usable, None]
+
+    return pivots + directions * distances[:, None], degenerate
+
+def pole_position(root, pivot, end):
+    """Single-chain pole_positions, with the pole landing on the pivot for a straight chain."""
+    positions, _ = pole_positions(root, pivot, end)
+    return positions[0]
+
+def refine_pole(pole, ik_root, ik_end, ik_pivot, fk_pivot):
+    """
+    One convergence step of an FK -> IK snap: rotates the pole around the IK root -> end axis
+    by the angle that separates the IK pivot from the FK pivot. Rotating the pole around that axis
+    rotates the IK plane with it, so a chain whose only error is a plane offset (pole angle,
+    non-planar rest pose) lands on the FK pivot in one step.
+    Returns the pole unchanged if either pivot lies on the axis.
+    """
+    pole, ik_root, ik_end, ik_pivot, fk_pivot = (np.asarray(v, dtype=np.float64)
+                                                 for v in (pole, ik_root, ik_end, ik_pivot, fk_pivot))
+    axis = ik_end - ik_root
+    axis_length = np.linalg.norm(axis)
+    if axis_length == 0.0:
+        return pole
+    axis = axis / axis_length
+
+    def perpendicular(point):
+        offset = point - ik_root
+        return offset - axis * (offset @ axis)
+    from_dir, to_dir = perpendicular(ik_pivot), perpendicular(fk_pivot)
+    if np.linalg.norm(from_dir) == 0.0 or np.linalg.norm(to_dir) == 0.0:
+        return pole
+    angle = np.arctan2(axis @ np.cross(from_dir, to_dir), from_dir @ to_dir)
+
+    # Rodrigues rotation of the pole around the axis through the IK root
+    offset = pole - ik_root
+    rotated = (offset * np.cos(angle) + np.cross(axis, offset) * np.sin(angle)
+               + axis * (axis @ offset) * (1.0 - np.cos(angle)))
+    return ik_root + rotated
+
+def chain_residual(positions_a, positions_b):
+    """Largest distance between matching points (e.g. heads and tails) of two chains."""
+    return float(np.linalg.norm(np.asarray(positions_a, dtype=np.float64) - positions_b, axis=-1).max())
+
+def pose_to_location(translations, rest, parent_pose=None, parent_rest=None):
+    """
+    Converts pose-space translations (N, 3) into the bone's `location` channel values (N, 3),
+    e.g. to key a batch of solved pole positions. The location only depends on the
+    translation, whatever the bone's rotation and scale are. Parent matrices can be (4, 4) or (N, 4, 4).
+    """
+    translations = np.atleast_2d(np.asarray(translations, dtype=np.float64))
+    origin = np.asarray(rest, dtype=np.float64)
+    if parent_pose is not None:
+        origin = np.asarray(parent_pose) @ np.linalg.inv(parent_rest) @ origin
+    points = np.concatenate([translations, np.ones((len(translations), 1))], axis=1)
+    local = np.linalg.inv(origin) @ points[..., None]
+    return local[..., :3, 0]
+
+#============================================================
+#  NAMING
+#============================================================
+_SIDE_SUFFIX = re.compile(r'^(?P<base>.*[._])(?P<side>[LRlr])(?P<number>\.\d+)?$')
+_OPPOSITE_SIDE = {'L': 'R', 'R': 'L', 'l': 'r', 'r': 'l'}
+
+def mirror_name(name):
+    """
+    The opposite-side name of a `.L/.R` or `_L/_R` suffixed name (hand_ik.L -> hand_ik.R,
+    leg_fk_L -> leg_fk_R, arm.L.001 -> arm.R.001), or None for names without a side.
+    """
+    match = _SIDE_SUFFIX.match(name)
+    if match is None:
+        return None
+    return f"{match['base']}{_OPPOSITE_SIDE[match['side']]}{match['number'] or ''}"
+
+
+#============================================================
+#  COMPARISON
+#============================================================
+def are_matrices_fuzzy_equal(mat1, mat2, tolerance=0.0001):
+    for i in range(4):
+        for j in range(4):
+            if abs(mat1[i][j] - mat2[i][j]) > tolerance:
+                return False
+    return True
+
+def matrices_fuzzy_equal_batch(mats1, mats2, tolerance=0.0001):
+    """Vectorized are_matrices_fuzzy_equal over (..., 4, 4) arrays. Returns one bool per matrix."""
+    return np.all(np.abs(np.asarray(mats1) - np.asarray(mats2)) <= tolerance, axis=(-2, -1))
+
+def transform_differences(mats1, mats2):
+    """
+    Splits the difference between two stacks of (..., 4, 4) matrices into
+    translation distance, rotation angle (radians) and largest per-axis scale difference.
+    """
+    mats1, mats2 = np.asarray(mats1, dtype=np.float64), np.asarray(mats2, dtype=np.float64)
+    translation = np.linalg.norm(mats1[..., :3, 3] - mats2[..., :3, 3], axis=-1)
+
+    scale1 = np.linalg.norm(mats1[..., :3, :3], axis=-2)
+    scale2 = np.linalg.norm(mats2[..., :3, :3], axis=-2)
+    scale = np.abs(scale1 - scale2).max(axis=-1)
+
+    rotation1 = mats1[..., :3, :3] / np.where(scale1 > 0.0, scale1, 1.0)[..., None, :]
+    rotation2 = mats2[..., :3, :3] / np.where(scale2 > 0.0, scale2, 1.0)[..., None, :]
+    # |R1 - R2| = 2 * sqrt(2) * sin(angle / 2): unlike arccos of the trace, this stays
+    # accurate for the tiny angles a tolerance check cares about.
+    chord = np.linalg.norm(rotation1 - rotation2, axis=(-2, -1)) / (2.0 * np.sqrt(2.0))
+    rotation = 2.0 * np.arcsin(np.clip(chord, 0.0, 1.0))
+    return translation, rotation, scale
+
+def transforms_match_batch(mats1, mats2, location_tolerance=0.0001, rotation_tolerance=0.0001, scale_tolerance=0.0001):
+    """Like matrices_fuzzy_equal_batch, with separate tolerances for translation, rotation (radians) and scale."""
+    translation, rotation, scale = transform_differences(mats1, mats2)
+    return (translation <= location_tolerance) & (rotation <= rotation_tolerance) & (scale <= scale_tolerance)
+
+#============================================================
+#  TRANSFORM DUMPS (streamed whole-rig transforms over a frame range)
+#============================================================
+# File layout:
+#   b"RIGDUMP1" | uint32 header size | JSON header | rest matrices (bones, 16) | one record block per frame
+# Each frame block is (bones, record size) float32, the fields of DUMP_FIELDS side by side.
+# Matrices are stored row-major. Frames are appended one at a time, so writing a long shot
+# never holds more than one frame in memory, and reading goes through a memory map.
+DUMP_MAGIC = b"RIGDUMP1"
+DUMP_DTYPE = np.dtype('<f4')
+DUMP_FIELDS = (
+    ("location", 3),
+    ("rotation_quaternion", 4),
+    ("rotation_euler", 3),
+    ("rotation_axis_angle", 4),
+    ("scale", 3),
+    ("matrix_world", 16),
+)
+
+def _dump_layout(fields):
+    layout, offset = {}, 0
+    for name, size in fields:
+        layout[name] = (offset, size)
+        offset += size
+    return layout, offset
+
+class TransformDumpWriter:
+    """Writes a transform dump frame by frame. Use as a context manager."""
+    def __init__(self, filepath, bone_names, frames, rest, armature_name=""):
+        self.bone_names = list(bone_names)
+        self.frames = [int(frame) for frame in frames]
+        _, self.record_size = _dump_layout(DUMP_FIELDS)
+        header = json.dumps({
+            "version": 1,
+            "armature": armature_name,
+            "bones": self.bone_names,
+            "frames": self.frames,
+            "fields": [list(field) for field in DUMP_FIELDS],
+        }).encode('utf-8')
+
+        self._file = open(filepath, 'wb')
+        self._file.write(DUMP_MAGIC)
+        self._file.write(np.uint32(len(header)).astype('<u4').tobytes())
+        self._file.write(header)
+        self._file.write(np.asarray(rest, dtype=DUMP_DTYPE).reshape(len(self.bone_names), 16).tobytes())
+        self.frames_written = 0
+
+    def write_frame(self, records):
+        """Appends one frame: a (bones, record size) array, the DUMP_FIELDS of each bone side by side."""
+        records = np.asarray(records, dtype=DUMP_DTYPE)
+        if records.shape != (len(self.bone_names), self.record_size):
+            raise ValueError(f"Expected a {(len(self.bone_names), self.record_size)} frame, got {records.shape}")
+        self._file.write(records.tobytes())
+        self.frames_written += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TransformDump:
+    """A transform dump opened for reading. `data` is a (frames, bones, record size) memory map."""
+    def __init__(self, header, rest, data):
+        self.armature_name = header["armature"]
+        self.bone_names = header["bones"]
+        self.frames = header["frames"][:len(data)]
+        self.rest = rest
+        self.data = data
+        self.layout, _ = _dump_layout(tuple(header["fields"]))
+
+    def field(self, name):
+        """A (frames, bones, size) view of one field; matrix_world is reshaped to (frames, bones, 4, 4)."""
+        offset, size = self.layout[name]
+        values = self.data[..., offset:offset + size]
+        return values.reshape(values.shape[:2] + (4, 4)) if size == 16 else values
+
+def read_transform_dump(filepath):
+    with open(filepath, 'rb') as f:
+        if f.read(len(DUMP_MAGIC)) != DUMP_MAGIC:
+            raise ValueError(f"{filepath} is not a transform dump")
+        header_size = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+        header = json.loads(f.read(header_size).decode('utf-8'))
+
+    bone_count = len(header["bones"])
+    record_size = _dump_layout(tuple(header["fields"]))[1]
+    rest_offset = len(DUMP_MAGIC) + 4 + header_size
+    rest = np.fromfile(filepath, dtype=DUMP_DTYPE, count=bone_count * 16, offset=rest_offset)
+    data_offset = rest_offset + rest.nbytes
+
+    # A dump cut short (cancelled bake, crash) still reads up to its last complete frame.
+    frame_bytes = bone_count * record_size * DUMP_DTYPE.itemsize
+    frame_count = min(len(header["frames"]), (os.path.getsize(filepath) - data_offset) // frame_bytes if frame_bytes else 0)
+    if frame_count == 0:
+        data = np.empty((0, bone_count, record_size), dtype=DUMP_DTYPE)
+    else:
+        data = np.memmap(filepath, dtype=DUMP_DTYPE, mode='r', offset=data_offset,
+                         shape=(frame_count, bone_count, record_size))
+    return TransformDump(header, rest.reshape(bone_count, 4, 4), data)
+
+def diff_transform_dumps(dump_a, dump_b, tolerance=0.0001, chunk_frames=256):
+    """
+    Per-bone drift between two dumps, over the bones and frames they share.
+    Frames are compared in chunks, so memory stays flat on long shots.
+    Returns a dict with the drifting bones (worst first) and the bones only found in one dump.
+    """
+    names_b = {name: i for i, name in enumerate(dump_b.bone_names)}
+    common = [(i, names_b[name]) for i, name in enumerate(dump_a.bone_names) if name in names_b]
+    bones_a = np.array([i for i, _ in common], dtype=np.intp)
+    bones_b = np.array([j for _, j in common], dtype=np.intp)
+
+    frames_b = {frame: i for i, frame in enumerate(dump_b.frames)}
+    frame_pairs = [(i, frames_b[frame]) for i, frame in enumerate(dump_a.frames) if frame in frames_b]
+
+    offset, _ = dump_a.layout["matrix_world"]
+    max_error = np.zeros(len(common))
+    max_translation = np.zeros(len(common))
+    worst_frame = np.full(len(common), -1, dtype=np.int64)
+    rest_error = np.abs(dump_a.rest[bones_a].astype(np.float64) - dump_b.rest[bones_b]).max(axis=(1, 2)) \
+        if len(common) else np.zeros(0)
+
+    for start in range(0, len(frame_pairs), chunk_frames):
+        chunk = frame_pairs[start:start + chunk_frames]
+        rows_a = [i for i, _ in chunk]
+        rows_b = [j for _, j in chunk]
+        # Compare every recorded field, but report translation drift from the world matrix
+        values_a = dump_a.data[rows_a][:, bones_a].astype(np.float64)
+        values_b = dump_b.data[rows_b][:, bones_b].astype(np.float64)
+        error = np.abs(values_a - values_b).max(axis=2)
+        translation_a = values_a[..., offset:offset + 16].reshape(len(chunk), -1, 4, 4)[..., :3, 3]
+        translation_b = values_b[..., offset:offset + 16].reshape(len(chunk), -1, 4, 4)[..., :3, 3]
+        translation = np.linalg.norm(translation_a - translation_b, axis=2)
+
+        chunk_worst = error.argmax(axis=0)
+        chunk_max = error.max(axis=0)
+        improved = chunk_max > max_error
+        worst_frame[improved] = np.array([dump_a.frames[rows_a[k]] for k in chunk_worst[improved]], dtype=np.int64)
+        max_error = np.maximum(max_error, chunk_max)
+        max_translation = np.maximum(max_translation, translation.max(axis=0))
+
+    drifting = []
+    for k in np.argsort(-np.maximum(max_error, rest_error)):
+        if max_error[k] <= tolerance and rest_error[k] <= tolerance:
+            break
+        drifting.append({
+            "bone": dump_a.bone_names[bones_a[k]],
+            "max_error": float(max_error[k]),
+            "max_translation": float(max_translation[k]),
+            "worst_frame": int(worst_frame[k]),
+            "rest_error": float(rest_error[k]),
+        })
+    return {
+        "frames_compared": len(frame_pairs),
+        "bones_compared": len(common),
+        "drifting": drifting,
+        "only_in_a": [name for name in dump_a.bone_names if name not in names_b],
+        "only_in_b": sorted(set(dump_b.bone_names).difference(dump_a.bone_names)),
+    }
+
+
+#============================================================
+#  SYNTHETIC ARMATURES
+#============================================================
+class SyntheticRig:
+    """
+    A generated armature made of chains. Every source chain has a target chain of the
+    same length, like the FK and IK chains of a limb.
+    """
+    def __init__(self, parents, rest, basis, source_indices, target_indices):
+        self.parents = parents
+        self.rest = rest
+        self.basis = basis
+        self.source_indices = source_indices
+        self.target_indices = target_indices
+
+    @property
+    def bone_count(self):
+        return len(self.parents)
+
+    def pose(self):
+        return forward_kinematics(self.parents, self.rest, self.basis)
+
+def _random_rotations(rng, count, max_angle=np.pi):
+    """Random rotation matrices (count, 3, 3) from axis-angle, with angles up to max_angle."""
+    axes = rng.normal(size=(count, 3))
+    axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+    angles = rng.uniform(-max_angle, max_angle, size=count)
+    x, y, z = axes.T
+    c, s = np.cos(angles), np.sin(angles)
+    t = 1.0 - c
+    return np.stack([
+        np.stack([t * x * x + c, t * x * y - s * z, t * x * z + s * y], axis=-1),
+        np.stack([t * x * y + s * z, t * y * y + c, t * y * z - s * x], axis=-1),
+        np.stack([t * x * z - s * y, t * y * z + s * x, t * z * z + c], axis=-1),
+    ], axis=1)
+
+def make_synthetic_rig(bone_count, min_chain_length=1, max_chain_length=6, seed=0):
+    """
+    Builds a SyntheticRig of about `bone_count` bones: random-length chain pairs, random
+    rest orientations and bone lengths, and a random pose on every bone.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = []
+    remaining = max(bone_count // 2, 1)
+    while remaining > 0:
+        length = min(int(rng.integers(min_chain_length, max_chain_length + 1)), remaining)
+        lengths.append(length)
+        remaining -= length
+    half = sum(lengths)
+    count = half * 2
+
+    parents = np.full(count, -1, dtype=np.intp)
+    rest = np.tile(np.eye(4), (count, 1, 1))
+    rest[:, :3, :3] = _random_rotations(rng, count)
+    source_indices = np.arange(half, dtype=np.intp)
+    target_indices = np.arange(half, count, dtype=np.intp)
+
+    # Chains run along each bone's Y axis, like Blender bones.
+    bone_lengths = rng.uniform(0.1, 1.0, size=count)
+    rest[:, :3, 3] = rng.uniform(-5.0, 5.0, size=(count, 3))
+    for offset in (0, half):
+        start = offset
+        for length in lengths:
+            for i in range(start + 1, start + length):
+                parents[i] = i - 1
+                rest[i, :3, 3] = rest[i - 1, :3, 3] + rest[i - 1, :3, 1] * bone_lengths[i - 1]
+            start += length
+
+    basis = np.tile(np.eye(4), (count, 1, 1))
+    basis[:, :3, :3] = _random_rotations(rng, count, max_angle=np.pi / 3)
+    basis[:, :3, 3] = rng.uniform(-0.2, 0.2, size=(count, 3))
+    return SyntheticRig(parents, rest, basis, source_indices, target_indices)
+
+def snap_synthetic_chains(rig, pose=None):
+    """
+    Snaps every target chain of a SyntheticRig onto its source chain, the same way
+    rigging_tools.copy_bone_chain does, for all chains at once. Returns the new basis matrices.
+    """
+    if pose is None:
+        pose = rig.pose()
+    src, tgt = rig.source_indices, rig.target_indices
+    target_pose = pose.copy()
+    target_pose[tgt] = snap_matrix(pose[src], rig.rest[src], rig.rest[tgt])
+
+    basis = rig.basis.copy()
+    parents = rig.parents[tgt]
+    has_parent = parents >= 0
+    child, root = tgt[has_parent], tgt[~has_parent]
+    basis[root] = pose_to_basis(target_pose[root], rig.rest[root])
+    basis[child] = pose_to_basis(target_pose[child], rig.rest[child],
+                                 target_pose[parents[has_parent]], rig.rest[parents[has_parent]])
+    return basis
+
+def solve_two_bone_ik(root, target, pole, upper_length, lower_length, pole_offset=0.0, pole_twist=0.0):
+    """
+    A synthetic two-bone IK solver, standing in for Blender's IK constraint in benchmarks.
+    Returns (pivot, end). `pole_offset` rotates the bend plane away from the pole (like an IK
+    constraint's pole angle) and `pole_twist` adds an error that depends on the plane's
+    orientation (like limits or a non-planar rest pose), so convergence takes more than one step.
+    The target is clamped to the chain's reach, like an IK chain without stretch.
+    """
+    root, target, pole = (np.asarray(v, dtype=np.float64) for v in (root, target, pole))
+    to_target = target - root
+    distance = np.clip(np.linalg.norm(to_target), abs(upper_length - lower_length) + 1e-9,
+                       upper_length + lower_length - 1e-9)
+    axis = to_target / np.linalg.norm(to_target)
+
+    plane = (pole - root) - axis * ((pole - root) @ axis)
+    plane /= np.linalg.norm(plane)
+    reference = np.cross(axis, [0.0, 0.0, 1.0] if abs(axis[2]) < 0.9 else [1.0, 0.0, 0.0])
+    reference /= np.linalg.norm(reference)
+    phase = np.arctan2(axis @ np.cross(reference, plane), reference @ plane)
+    angle = pole_offset + pole_twist * np.sin(phase)
+    plane = plane * np.cos(angle) + np.cross(axis, plane) * np.sin(angle)
+
+    along = (upper_length ** 2 - lower_length ** 2 + distance ** 2) / (2.0 * distance)
+    pivot = root + axis * along + plane * np.sqrt(max(upper_length ** 2 - along ** 2, 0.0))
+    return pivot, root + axis * distance
+
+def benchmark_ik_convergence(limb_count=1000, tolerance=0.0001, max_iterations=10, seed=0):
+    """
+    Snaps random FK limbs to a synthetic IK with a random pole offset and twist, refining the
+    pole until the IK pivot matches the FK pivot. Reports the iterations needed per limb.
+    """
+    rng = np.random.default_rng(seed)
+    iterations = np.zeros(limb_count, dtype=np.intp)
+    errors = np.zeros(limb_count)
+    start = time.perf_counter()
+    for limb in range(limb_count):
+        upper, lower = rng.uniform(0.3, 1.0, size=2)
+        root = rng.uniform(-1.0, 1.0, size=3)
+        directions = rng.normal(size=(2, 3))
+        directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+        fk_pivot = root + directions[0] * upper
+        fk_end = fk_pivot + directions[1] * lower
+        pole_offset, pole_twist = rng.uniform(-0.5, 0.5), rng.uniform(-0.3, 0.3)
+
+        pole = pole_position(root, fk_pivot, fk_end)
+        for iteration in range(1, max_iterations + 1):
+            ik_pivot, ik_end = solve_two_bone_ik(root, fk_end, pole, upper, lower, pole_offset, pole_twist)
+            error = chain_residual([ik_pivot, ik_end], [fk_pivot, fk_end])
+            if error <= tolerance:
+                break
+            pole = refine_pole(pole, root, ik_end, ik_pivot, fk_pivot)
+        iterations[limb], errors[limb] = iteration, error
+    elapsed = time.perf_counter() - start
+
+    return {
+        "limbs": limb_count,
+        "seconds": elapsed,
+        "mean_iterations": float(iterations.mean()),
+        "max_iterations": int(iterations.max()),
+        "converged": int((errors <= tolerance).sum()),
+        "max_error": float(errors.max()),
+    }
+
+#============================================================
+#  BENCHMARKS
+#============================================================
+def benchmark_snapping(bone_count, seed=0, repeat=3):
+    """Throughput and accuracy of snap_synthetic_chains on a generated rig."""
+    rig = make_synthetic_rig(bone_count, seed=seed)
+    pose = rig.pose()
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        basis = snap_synthetic_chains(rig, pose)
+        best = min(best, time.perf_counter() - start)
+
+    # Accuracy: re-evaluate the hierarchy and compare each target against its source plus rest offset.
+    new_pose = forward_kinematics(rig.parents, rig.rest, basis)
+    src, tgt = rig.source_indices, rig.target_indices
+    expected = snap_matrix(pose[src], rig.rest[src], rig.rest[tgt])
+    max_error = float(np.abs(new_pose[tgt] - expected).max())
+    matching = int(matrices_fuzzy_equal_batch(new_pose[tgt], expected).sum())
+
+    return {
+        "bones": rig.bone_count,
+        "snapped": len(tgt),
+        "seconds": best,
+        "bones_per_second": len(tgt) / best if best else float('inf'),
+        "max_error": max_error,
+        "fuzzy_equal": matching,
+    }
+
+def benchmark_pole_positions(count, seed=0, repeat=3):
+    """Time of pole_positions for `count` chains, against one pole_position call per chain."""
+    rng = np.random.default_rng(seed)
+    roots, pivots, ends = (rng.uniform(-1.0, 1.0, size=(count, 3)) for _ in range(3))
+
+    batched = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pole_positions(roots, pivots, ends)
+        batched = min(batched, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(min(count, 10000)):
+        pole_position(roots[i], pivots[i], ends[i])
+    per_chain = (time.perf_counter() - start) / min(count, 10000) * count
+
+    return {"chains": count, "seconds": batched, "per_chain_seconds": per_chain}
+
+def run_benchmarks(bone_counts=(10, 1000, 100000), seeds=(0, 1, 2)):
+    results = []
+    for bone_count in bone_counts:
+        for seed in seeds:
+            result = benchmark_snapping(bone_count, seed=seed)
+            results.append(result)
+            print(f"snap {result['bones']:>7} bones (seed {seed}): "
+                  f"{result['seconds'] * 1e3:8.2f}ms, {result['bones_per_second']:12.0f} bones/s, "
+                  f"max error {result['max_error']:.2e}, "
+                  f"{result['fuzzy_equal']}/{result['snapped']} within tolerance")
+    for chain_count in (1000, 100000):
+        result = benchmark_pole_positions(chain_count)
+        results.append(result)
+        print(f"poles {result['chains']:>7} chains: {result['seconds'] * 1e3:8.2f}ms batched, "
+              f"{result['per_chain_seconds'] * 1e3:8.2f}ms one by one")
+    result = benchmark_ik_convergence()
+    results.append(result)
+    print(f"ik convergence, {result['limbs']} limbs: {result['mean_iterations']:.2f} iterations on average, "
+          f"{result['max_iterations']} at most, {result['converged']} converged, "
+          f"max error {result['max_error']:.2e} ({result['seconds'] * 1e3:.1f}ms)")
+    return results
+
+def _print_dump_diff(path_a, path_b, tolerance=0.0001):
+    report = diff_transform_dumps(read_transform_dump(path_a), read_transform_dump(path_b), tolerance)
+    print(f"{report['bones_compared']} bones over {report['frames_compared']} frames, "
+          f"{len(report['drifting'])} drifting (tolerance {tolerance})")
+    for drift in report["drifting"]:
+        print(f"  {drift['bone']}: max error {drift['max_error']:.6f} at frame {drift['worst_frame']}, "
+              f"translation {drift['max_translation']:.6f}, rest {drift['rest_error']:.6f}")
+    for key in ("only_in_a", "only_in_b"):
+        if report[key]:
+            print(f"  {key.replace('_', ' ')}: {', '.join(report[key])}")
+    return 1 if report["drifting"] or report["only_in_a"] or report["only_in_b"] else 0
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "diff":
+        sys.exit(_print_dump_diff(sys.argv[2], sys.argv[3], *map(float, sys.argv[4:5])))
+    run_benchmarks()
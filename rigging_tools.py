@@ -1,4 +1,9 @@
 # rigging_tools.py (Version 2.0)
+#
+# Installing: the add-on is two modules, rigging_tools.py and the bpy-free rigging_core.py.
+# Copy both into Blender's scripts/addons folder, or zip them side by side (no folder) and use
+# Install from the add-on preferences. Installing rigging_tools.py on its own no longer works.
+# rigging_benchmarks.py (timings to run from the Python console) is optional and never imported here.
 
 bl_info = {
     "name": "My Custom Rigging Tools",
@@ -10,84 +15,1341 @@ bl_info = {
     "category": "Development",
 }
 
+import functools
+import importlib.util
+import time
+from collections import OrderedDict, deque
+
 import bpy
+from bpy.app.handlers import persistent
+from bpy_extras.io_utils import ExportHelper
 from mathutils import Matrix, Vector
-from mathutils.geometry import intersect_point_line
+
+# The bpy-free math lives in rigging_core; the functions below are thin adapters on top of it.
+# rigging_core and NumPy are imported by the functions that use them, on first use: rig scripts
+# import this module on every file load, including on render and farm nodes that never snap.
+if importlib.util.find_spec("rigging_core") is None:
+    raise ImportError("rigging_tools needs rigging_core.py installed next to it (see the top of this file)")
 
 #============================================================
 #  UTILITY FUNCTIONS (The "Engine")
 #============================================================
-def _find_collection_recursive(collections, name):
-    """Helper to recursively search for a bone collection by name."""
-    # First, check the current level of collections
-    if name in collections:
-        return collections[name]
-    
-    # If not found, recurse into children
-    for coll in collections:
-        found_in_child = _find_collection_recursive(coll.children, name)
-        if found_in_child:
-            return found_in_child
-            
+# A snap target closer than this to the bone's current transform is left alone.
+SNAP_TOLERANCES = {"location_tolerance": 0.0001, "rotation_tolerance": 0.0001, "scale_tolerance": 0.0001}
+
+_COLLECTION_INDEX_CACHE_SIZE = 16
+
+# Armature data pointer -> {collection name: index in collections_all}, least recently used first.
+# Only indices are kept: bone collections aren't IDs, and a cached struct may point at freed data
+# once collections are removed and re-added.
+_collection_indices = OrderedDict()
+collection_index_stats = {"hits": 0, "misses": 0, "rebuilds": 0}
+
+def _build_collection_index(armature_data):
+    collection_index_stats["rebuilds"] += 1
+    key = armature_data.as_pointer()
+    index = {coll.name: i for i, coll in enumerate(armature_data.collections_all)}
+    _collection_indices[key] = index
+    _collection_indices.move_to_end(key)
+    while len(_collection_indices) > _COLLECTION_INDEX_CACHE_SIZE:
+        _collection_indices.popitem(last=False)
+    return index
+
+def find_bone_collection(armature_data, name):
+    """
+    Finds a bone collection by name, at any nesting depth, through a cached name index.
+    The index is dropped whenever the armature data is updated (see _on_armature_updated),
+    and every hit is checked against the live collection, so it can't go stale in between.
+    """
+    key = armature_data.as_pointer()
+    index = _collection_indices.get(key)
+    if index is None:
+        index = _build_collection_index(armature_data)
+    else:
+        _collection_indices.move_to_end(key)
+
+    collections = armature_data.collections_all
+    i = index.get(name)
+    if i is not None and i < len(collections):
+        collection = collections[i]
+        if collection.name == name:
+            collection_index_stats["hits"] += 1
+            return collection
+
+    collection_index_stats["misses"] += 1
+    # Collections moved or were renamed since the index was built, or `name` was just added.
+    if i is not None or name in collections:
+        i = _build_collection_index(armature_data).get(name)
+        return None if i is None else collections[i]
     return None
 
+def invalidate_collection_index(armature_data=None):
+    """Drops the cached index of one armature, or of all armatures."""
+    if armature_data is None:
+        _collection_indices.clear()
+    else:
+        _collection_indices.pop(armature_data.as_pointer(), None)
+
+@persistent
+def _on_armature_updated(scene, depsgraph):
+    """Drops the cached collection index of armature data that just changed (bones, collections)."""
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Armature):
+            invalidate_collection_index(update.id.original)
+
+@persistent
+def _on_rig_data_reloaded(*args):
+    """Loading a file or stepping through undo reallocates ID data, so cached pointers must go."""
+    invalidate_collection_index()
+    _box_state_indices.clear()
+    _snap_plans.clear()
+    _mirror_maps.clear()
+    _rig_ui_plans.clear()
+    _source_matrix_caches.clear()
+
+
+def _to_matrix(array):
+    return Matrix(array.tolist())
+
+def _pose_matrix(pose_bone, matrices=None):
+    """The bone's evaluated pose matrix, or its cached one when `matrices` ({name: Matrix}) holds it."""
+    if matrices is not None:
+        matrix = matrices.get(pose_bone.name)
+        if matrix is not None:
+            return matrix
+    return pose_bone.matrix
+
+def _snapped_matrix(source_bone, target_bone, matrices=None):
+    """bpy adapter for rigging_core.snap_matrix."""
+    from rigging_core import snap_matrix
+    return _to_matrix(snap_matrix(_pose_matrix(source_bone, matrices), source_bone.bone.matrix_local,
+                                  target_bone.bone.matrix_local))
+
+def copy_bone_transform(source_bone, target_bone, skip_unchanged=True):
+    """Snaps one bone onto another. Returns False when the target was already in place and left alone."""
+    import numpy as np
+    from rigging_core import transforms_match_batch
+    matrix = _snapped_matrix(source_bone, target_bone)
+    if skip_unchanged and transforms_match_batch(np.array(target_bone.matrix), np.array(matrix), **SNAP_TOLERANCES):
+        return False
+    target_bone.matrix = matrix
+    return True
+
+def _pose_matrix_to_basis(pose_bone, pose_matrix, parent_pose_matrix=None):
+    """
+    Converts a pose-space matrix into the bone's local (basis) matrix.
+    Unlike assigning `pose_bone.matrix`, the parent's pose matrix can be passed in,
+    so the parent doesn't have to be re-evaluated by the depsgraph first.
+    """
+    bone = pose_bone.bone
+    parent = pose_bone.parent
+    if parent is None:
+        return bone.convert_local_to_pose(pose_matrix, bone.matrix_local, invert=True)
+    if parent_pose_matrix is None:
+        parent_pose_matrix = parent.matrix
+    return bone.convert_local_to_pose(pose_matrix, bone.matrix_local,
+                                      parent_matrix=parent_pose_matrix,
+                                      parent_matrix_local=parent.bone.matrix_local,
+                                      invert=True)
+
+def _parent_pose_matrix(pose_bone, new_matrices, matrices=None):
+    """
+    Returns the pose matrix the parent of `pose_bone` will have once `new_matrices` are written.
+    Bones sitting between a written ancestor and `pose_bone` are rebuilt from their (unchanged) basis.
+    An unwritten parent is read from `matrices` (cached pose matrices) when it's there.
+    """
+    parent = pose_bone.parent
+    if parent is None:
+        return None
+    if parent.name in new_matrices:
+        return new_matrices[parent.name]
+
+    between = [parent]
+    for ancestor in parent.parent_recursive:
+        if ancestor.name in new_matrices:
+            matrix = new_matrices[ancestor.name]
+            for pbone in reversed(between):
+                matrix = pbone.bone.convert_local_to_pose(pbone.matrix_basis, pbone.bone.matrix_local,
+                                                          parent_matrix=matrix,
+                                                          parent_matrix_local=pbone.parent.bone.matrix_local)
+                new_matrices[pbone.name] = matrix
+            return matrix
+        between.append(ancestor)
+    return _pose_matrix(parent, matrices)
+
+def _apply_pose_matrices(writes, skip_unchanged=True, matrices=None):
+    """
+    Writes a list of (pose_bone, pose_matrix) pairs, parents first.
+    Each child's basis is computed from its parent's *new* matrix, so no depsgraph
+    update is needed between bones. The caller is responsible for the final update.
+    With `skip_unchanged`, bones already at their target (within SNAP_TOLERANCES) are
+    not written, unless one of their ancestors is. `matrices` supplies cached pose
+    matrices for unwritten parents (see SourceMatrixCache).
+    Returns the names of the written and of the skipped bones.
+    """
+    import numpy as np
+    from rigging_core import transforms_match_batch
+    ordered = sorted(writes, key=lambda w: len(w[0].parent_recursive))
+    unchanged = [False] * len(ordered)
+    if skip_unchanged and ordered:
+        unchanged = transforms_match_batch(np.array([pose_bone.matrix for pose_bone, _ in ordered]),
+                                           np.array([pose_matrix for _, pose_matrix in ordered]),
+                                           **SNAP_TOLERANCES)
+
+    new_matrices, written, skipped = {}, [], []
+    for (pose_bone, pose_matrix), in_place in zip(ordered, unchanged):
+        if in_place and not any(ancestor.name in new_matrices for ancestor in pose_bone.parent_recursive):
+            skipped.append(pose_bone.name)
+            continue
+        parent_matrix = _parent_pose_matrix(pose_bone, new_matrices, matrices)
+        pose_bone.matrix_basis = _pose_matrix_to_basis(pose_bone, pose_matrix, parent_matrix)
+        new_matrices[pose_bone.name] = pose_matrix
+        written.append(pose_bone.name)
+    return written, skipped
 
-def copy_bone_transform(source_bone, target_bone):
-    source_rest_matrix = source_bone.bone.matrix_local
-    target_rest_matrix = target_bone.bone.matrix_local
-    offset_matrix = source_rest_matrix.inverted() @ target_rest_matrix
-    target_bone.matrix = source_bone.matrix @ offset_matrix
+def _solve_bone_pairs(pairs, matrices=None):
+    """Returns the (target_pose_bone, new_pose_matrix) writes for (source, target) pose bone pairs."""
+    return [(target_bone, _snapped_matrix(source_bone, target_bone, matrices)) for source_bone, target_bone in pairs]
 
-def copy_bone_chain(source_names, target_names, armature_obj):
+def _solve_bone_chain(source_names, target_names, armature_obj):
+    """Returns the (target_pose_bone, new_pose_matrix) pairs for a chain snap, without writing anything."""
     pose_bones = armature_obj.pose.bones
-    for s_name, t_name in zip(source_names, target_names):
-        if s_name in pose_bones and t_name in pose_bones:
-            copy_bone_transform(pose_bones[s_name], pose_bones[t_name])
-            bpy.context.view_layer.update()
+    return _solve_bone_pairs([(pose_bones[s_name], pose_bones[t_name])
+                              for s_name, t_name in zip(source_names, target_names)
+                              if s_name in pose_bones and t_name in pose_bones])
 
-def snap_pole_vector(pole_bone_name, root_bone_name, pivot_bone_name, end_bone_name, armature_obj):
+def copy_bone_chain(source_names, target_names, armature_obj, per_bone_update=False, skip_unchanged=True):
+    """
+    Snaps each target bone onto its source bone.
+    By default all target matrices are computed analytically (parent first) and the
+    view layer is updated once at the end. `per_bone_update=True` keeps the old
+    behaviour of one depsgraph update per bone, for comparison.
+    Returns the number of written and of skipped (already in place) bones.
+    """
+    pose_bones = armature_obj.pose.bones
+    if per_bone_update:
+        written = skipped = 0
+        for s_name, t_name in zip(source_names, target_names):
+            if s_name in pose_bones and t_name in pose_bones:
+                if copy_bone_transform(pose_bones[s_name], pose_bones[t_name], skip_unchanged=skip_unchanged):
+                    bpy.context.view_layer.update()
+                    written += 1
+                else:
+                    skipped += 1
+        return written, skipped
+
+    # The sources must not depend on the targets: their matrices are read before anything is written.
+    written, skipped = _apply_pose_matrices(_solve_bone_chain(source_names, target_names, armature_obj),
+                                            skip_unchanged=skip_unchanged)
+    if written:
+        bpy.context.view_layer.update()
+    return len(written), len(skipped)
+
+def _solve_pole_vector(pole_bone_name, root_bone_name, pivot_bone_name, end_bone_name, armature_obj):
+    """Returns the (pole_pose_bone, new_pose_matrix) pair for a pole snap, or None if a bone is missing."""
     pose_bones = armature_obj.pose.bones
     if not all(name in pose_bones for name in [pole_bone_name, root_bone_name, pivot_bone_name, end_bone_name]):
+        return None
+    return _solve_pole(pose_bones[pole_bone_name], pose_bones[root_bone_name],
+                       pose_bones[pivot_bone_name], pose_bones[end_bone_name])
+
+def _solve_pole(pole_bone, root_bone, pivot_bone, end_bone, matrices=None):
+    from rigging_core import pole_position
+    # A pose bone's head is the translation of its pose matrix
+    heads = [_pose_matrix(pbone, matrices).translation for pbone in (root_bone, pivot_bone, end_bone)]
+    pole_matrix = _pose_matrix(pole_bone, matrices).copy()
+    pole_matrix.translation = Vector(pole_position(*heads).tolist())
+    return pole_bone, pole_matrix
+
+def snap_pole_vector(pole_bone_name, root_bone_name, pivot_bone_name, end_bone_name, armature_obj):
+    solved = _solve_pole_vector(pole_bone_name, root_bone_name, pivot_bone_name, end_bone_name, armature_obj)
+    if solved is None:
         return
-    root_loc, pivot_loc, end_loc = pose_bones[root_bone_name].head, pose_bones[pivot_bone_name].head, pose_bones[end_bone_name].head
-    line_point, _ = intersect_point_line(pivot_loc, root_loc, end_loc)
-    pole_vector = pivot_loc - line_point
-    pole_distance = (pivot_loc - root_loc).length
-    pole_bone_obj = pose_bones[pole_bone_name]
-    pole_bone_obj.matrix.translation = pivot_loc + (pole_vector.normalized() * pole_distance)
+    pole_bone_obj, pole_matrix = solved
+    pole_bone_obj.matrix = pole_matrix
     bpy.context.view_layer.update()
 
-def are_matrices_fuzzy_equal(mat1, mat2, tolerance=0.0001):
-    for i in range(4):
-        for j in range(4):
-            if abs(mat1[i][j] - mat2[i][j]) > tolerance:
+def _solve_ik_snap(ik_control_name, pole_name, source_end_name, root_name, pivot_name, armature_obj):
+    """Returns the pole and IK control writes for an FK -> IK snap, without writing anything."""
+    writes = []
+    solved = _solve_pole_vector(pole_name, root_name, pivot_name, source_end_name, armature_obj)
+    if solved is not None:
+        writes.append(solved)
+    writes.extend(_solve_bone_chain([source_end_name], [ik_control_name], armature_obj))
+    return writes
+
+def _keyed_channels(pose_bone):
+    """The transform channels to key on a bone, following its rotation mode."""
+    if pose_bone.rotation_mode == 'QUATERNION':
+        rotation = 'rotation_quaternion'
+    elif pose_bone.rotation_mode == 'AXIS_ANGLE':
+        rotation = 'rotation_axis_angle'
+    else:
+        rotation = 'rotation_euler'
+    return ('location', rotation, 'scale')
+
+def get_key_frames(armature_obj, bone_names, frame_start, frame_end):
+    """Returns the sorted frames in [frame_start, frame_end] holding a key on any of the given bones."""
+    anim_data = armature_obj.animation_data
+    if not (anim_data and anim_data.action):
+        return []
+    prefixes = tuple(f'pose.bones["{bpy.utils.escape_identifier(name)}"]' for name in bone_names)
+    frames = set()
+    for fcurve in anim_data.action.fcurves:
+        if not fcurve.data_path.startswith(prefixes):
+            continue
+        for keyframe in fcurve.keyframe_points:
+            frame = round(keyframe.co[0])
+            if frame_start <= frame <= frame_end:
+                frames.add(frame)
+    return sorted(frames)
+
+def _write_fcurve_keys(fcurve, frames, values, interpolation):
+    """
+    Merges keys into one F-curve in bulk: keys on existing frames get their value replaced
+    (handles move along, interpolation is kept, like keyframe_insert), the others are appended
+    with `interpolation` in one add() call. update() then sorts the keys and recalculates handles once.
+    """
+    import numpy as np
+    points = fcurve.keyframe_points
+    old_count = len(points)
+    co = np.empty(old_count * 2, dtype=np.float32)
+    points.foreach_get("co", co)
+    co = co.reshape(old_count, 2)
+
+    # Match new frames against existing keys
+    existing = {round(float(frame), 3): i for i, frame in enumerate(co[:, 0])}
+    replaced_at, replaced_values, added_frames, added_values = [], [], [], []
+    for frame, value in zip(frames, values):
+        i = existing.get(round(float(frame), 3))
+        if i is None:
+            added_frames.append(frame)
+            added_values.append(value)
+        else:
+            replaced_at.append(i)
+            replaced_values.append(value)
+
+    if replaced_at:
+        deltas = np.asarray(replaced_values, dtype=np.float32) - co[replaced_at, 1]
+        co[replaced_at, 1] += deltas
+        for handle in ("handle_left", "handle_right"):
+            handles = np.empty(old_count * 2, dtype=np.float32)
+            points.foreach_get(handle, handles)
+            handles = handles.reshape(old_count, 2)
+            handles[replaced_at, 1] += deltas
+            points.foreach_set(handle, handles.ravel())
+
+    if added_frames:
+        interpolations = [0] * old_count
+        if old_count:
+            points.foreach_get("interpolation", interpolations)
+        points.add(len(added_frames))
+        added = np.column_stack([added_frames, added_values]).astype(np.float32)
+        co = np.concatenate([co, added])
+        points.foreach_set("interpolation", interpolations + [interpolation] * len(added_frames))
+
+    points.foreach_set("co", co.ravel())
+    fcurve.update()
+
+def write_keyframes(armature_obj, keys, interpolation=None):
+    """
+    Keys a block of pose values in bulk, as a faster replacement for per-frame keyframe_insert.
+    `keys` maps (bone_name, channel) -> (frames, values), e.g.
+    {("hand_fk.L", "location"): ([1, 2, 3], [[x, y, z], [x, y, z], [x, y, z]])}.
+    Each F-curve is found or created once, filled with foreach_set and updated once.
+    New keys get `interpolation`, by default the user's preference for new keys;
+    replaced keys keep theirs. Returns the number of keys written.
+    """
+    import numpy as np
+    anim_data = armature_obj.animation_data or armature_obj.animation_data_create()
+    if anim_data.action is None:
+        anim_data.action = bpy.data.actions.new(f"{armature_obj.name}Action")
+    fcurves = anim_data.action.fcurves
+    existing = {(fcurve.data_path, fcurve.array_index): fcurve for fcurve in fcurves}
+    if interpolation is None:
+        interpolation = bpy.context.preferences.edit.keyframe_new_interpolation_type
+    interpolation_value = bpy.types.Keyframe.bl_rna.properties["interpolation"].enum_items[interpolation].value
+
+    written = 0
+    for (bone_name, channel), (frames, values) in keys.items():
+        frames = np.asarray(frames, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(frames), -1)
+        data_path = f'pose.bones["{bpy.utils.escape_identifier(bone_name)}"].{channel}'
+        for index in range(values.shape[1]):
+            fcurve = existing.get((data_path, index))
+            if fcurve is None:
+                fcurve = fcurves.new(data_path, index=index, action_group=bone_name)
+            _write_fcurve_keys(fcurve, frames, values[:, index], interpolation_value)
+            written += len(frames)
+    return written
+
+def _pole_keys(pole_bone, frames, heads, parent_poses, current):
+    """
+    Solves a pole over all baked frames in one pole_positions call and returns its location
+    keys, or None when the pole was already in place on every frame.
+    `heads` is (frames, 3, 3) root/pivot/end heads, `parent_poses` the parent's pose matrices.
+    """
+    import numpy as np
+    from rigging_core import pole_positions, pose_to_location
+    heads = np.asarray(heads, dtype=np.float64)
+    positions, _ = pole_positions(heads[:, 0], heads[:, 1], heads[:, 2])
+    if np.all(np.linalg.norm(positions - np.asarray(current), axis=1) <= SNAP_TOLERANCES["location_tolerance"]):
+        return None
+    parent = pole_bone.parent
+    locations = pose_to_location(positions, pole_bone.bone.matrix_local,
+                                 np.array(parent_poses) if parent else None,
+                                 parent.bone.matrix_local if parent else None)
+    return list(frames), locations
+
+def bake_snap(scene, armature_obj, frames, solve, cache=None, poles=()):
+    """
+    Runs a snap on every frame in `frames` and keys the bones it moves.
+    `solve(armature_obj)` returns (pose_bone, pose_matrix) pairs, like _solve_bone_chain.
+    The scene changes frame once per frame and is put back on its current frame afterwards.
+    Channel values are collected along the way and keyed in bulk at the end (see write_keyframes).
+    Bones that were already in place on every frame get no keys at all.
+    With a SourceMatrixCache, frames it already holds skip the frame change and are solved with
+    `solve(armature_obj, matrices)` instead; their targets are always keyed.
+    `poles` are (pole, root, pivot, end) pose bones left out of `solve`: only their chain heads
+    are collected per frame, then every pole is solved for all frames in one array operation and
+    keyed on its location (the only channel a pole snap changes).
+    Returns the number of baked frames.
+    """
+    frame_current = scene.frame_current
+    keys = {}
+    moved = set()
+    baked = 0
+    baked_frames = []
+    pole_inputs = [([], [], []) for _ in poles]  # per pole: chain heads, parent pose, current translation
+    try:
+        for frame in frames:
+            matrices = cache.get(frame) if cache is not None else None
+            if matrices is None:
+                scene.frame_set(frame)
+                # The frame change handler may already have stored it
+                if cache is not None and frame not in cache.rows:
+                    cache.store(frame, armature_obj)
+                writes = solve(armature_obj)
+                moved.update(_apply_pose_matrices(writes)[0])
+            else:
+                # The targets weren't evaluated on this frame, so they can't be compared.
+                writes = solve(armature_obj, matrices)
+                moved.update(_apply_pose_matrices(writes, skip_unchanged=False, matrices=matrices)[0])
+            if poles:
+                written = {pose_bone.name: pose_matrix for pose_bone, pose_matrix in writes}
+                for (pole_bone, *chain), (heads, parent_poses, current) in zip(poles, pole_inputs):
+                    heads.append([_pose_matrix(pbone, matrices).translation for pbone in chain])
+                    parent = pole_bone.parent
+                    if parent is not None:
+                        parent_pose = written.get(parent.name)
+                        parent_poses.append(parent_pose if parent_pose is not None else _pose_matrix(parent, matrices))
+                    current.append(_pose_matrix(pole_bone, matrices).translation)
+                baked_frames.append(frame)
+            for pose_bone, _ in writes:
+                for channel in _keyed_channels(pose_bone):
+                    frame_list, value_list = keys.setdefault((pose_bone.name, channel), ([], []))
+                    frame_list.append(frame)
+                    value_list.append(tuple(getattr(pose_bone, channel)))
+            baked += 1
+        keys = {key: values for key, values in keys.items() if key[0] in moved}
+        for (pole_bone, *_), inputs in zip(poles, pole_inputs):
+            if baked_frames:
+                pole_keys = _pole_keys(pole_bone, baked_frames, *inputs)
+                if pole_keys is not None:
+                    keys[(pole_bone.name, "location")] = pole_keys
+        write_keyframes(armature_obj, keys)
+    finally:
+        scene.frame_set(frame_current)
+    return baked
+
+#============================================================
+#  SNAP SPECS (declared once by rig scripts, resolved per armature)
+#============================================================
+class SnapSpecError(Exception):
+    """Raised when a snap spec is unknown or references bones the armature doesn't have."""
+
+class SnapSpec:
+    """
+    A named snap: each target bone is snapped onto its source bone, and an optional
+    pole (pole, root, pivot, end) is placed from the chain root -> pivot -> end.
+    `ik_chain` names the evaluated IK bones matching that root, pivot and end, which
+    converging snaps compare against the source chain.
+    """
+    def __init__(self, name, source_bones, target_bones, pole_bones=None, ik_chain=None):
+        self.name = name
+        self.source_bones = tuple(source_bones)
+        self.target_bones = tuple(target_bones)
+        self.pole_bones = tuple(pole_bones) if pole_bones else None
+        self.ik_chain = tuple(ik_chain) if ik_chain else None
+        if self.ik_chain and (not self.pole_bones or len(self.ik_chain) != 3):
+            raise SnapSpecError(f"Snap '{name}': an IK chain needs a pole and exactly 3 bones (root, pivot, end)")
+        if len(self.source_bones) != len(self.target_bones):
+            raise SnapSpecError(f"Snap '{name}': {len(self.source_bones)} source bones "
+                                f"for {len(self.target_bones)} target bones")
+
+    @property
+    def bone_names(self):
+        return self.source_bones + self.target_bones + (self.pole_bones or ()) + (self.ik_chain or ())
+
+class SnapPlan:
+    """A SnapSpec resolved against one armature: bone indices into pose.bones, targets parent first."""
+    def __init__(self, spec, bone_count, bone_indices, pairs, pole, ik_chain=None, registered_spec=None):
+        self.spec = spec
+        self.registered_spec = registered_spec or spec  # the spec as declared, before mirroring
+        self.bone_count = bone_count
+        self.bone_indices = bone_indices  # ((index, name), ...) for every bone the spec uses
+        self.pairs = pairs
+        self.pole = pole
+        self.ik_chain = ik_chain
+
+    def is_valid(self, pose_bones):
+        """Cheap check that the bone list hasn't changed since the plan was resolved."""
+        if len(pose_bones) != self.bone_count:
+            return False
+        return all(pose_bones[i].name == name for i, name in self.bone_indices)
+
+    def solve(self, armature_obj, matrices=None, include_pole=True):
+        """
+        Returns the (pose_bone, pose_matrix) writes of the snap, without writing anything.
+        `matrices` ({name: Matrix}) replaces the evaluated matrices of the bones it holds.
+        Bakes leave the pole out and solve it for all frames at once (see bake_snap).
+        """
+        pose_bones = armature_obj.pose.bones
+        writes = []
+        if self.pole is not None and include_pole:
+            writes.append(_solve_pole(*(pose_bones[i] for i in self.pole), matrices=matrices))
+        writes.extend(_solve_bone_pairs([(pose_bones[s], pose_bones[t]) for s, t in self.pairs], matrices))
+        return writes
+
+    def pole_bones(self, armature_obj):
+        """The (pole, root, pivot, end) pose bones, or None."""
+        if self.pole is None:
+            return None
+        pose_bones = armature_obj.pose.bones
+        return tuple(pose_bones[i] for i in self.pole)
+
+    def read_and_written_bones(self, armature_obj):
+        """Names of the bones the snap reads (sources, pole chain) and of the bones it writes."""
+        pose_bones = armature_obj.pose.bones
+        read = [pose_bones[s].name for s, _ in self.pairs]
+        written = [pose_bones[t].name for _, t in self.pairs]
+        if self.pole is not None:
+            read.extend(pose_bones[i].name for i in self.pole)
+            written.append(pose_bones[self.pole[0]].name)
+        return read, written
+
+    def run(self, armature_obj, skip_unchanged=True):
+        return run_snap_plans(armature_obj, [self], skip_unchanged)
+
+_snap_specs = {}
+# (armature object pointer, spec name, mirrored) -> SnapPlan
+_snap_plans = {}
+# armature object pointer -> (bone count, {bone name: opposite-side bone name})
+_mirror_maps = {}
+
+def register_snap_chain(name, source_bones, target_bones):
+    """Declares a chain snap. Rig scripts call this once, at load time."""
+    _snap_specs[name] = SnapSpec(name, source_bones, target_bones)
+    _rig_ui_plans.clear()  # compiled rig UIs resolve their snap buttons from the specs
+
+def register_ik_snap(name, ik_control_bone, pole_control_bone, source_end_bone, source_chain_root, source_chain_pivot,
+                     ik_chain=None):
+    """
+    Declares an FK -> IK snap: the pole is placed from the source chain, the IK control snapped onto its end.
+    `ik_chain` optionally names the IK bones (root, pivot, end) the FK chain should end up matching,
+    which allows converging snaps (see converge_ik_snap).
+    """
+    _snap_specs[name] = SnapSpec(name, (source_end_bone,), (ik_control_bone,),
+                                 pole_bones=(pole_control_bone, source_chain_root, source_chain_pivot, source_end_bone),
+                                 ik_chain=ik_chain)
+    _rig_ui_plans.clear()
+
+def get_snap_spec(name):
+    spec = _snap_specs.get(name)
+    if spec is None:
+        raise SnapSpecError(f"Unknown snap spec '{name}'")
+    return spec
+
+def _missing_bones(spec, pose_bones):
+    return [name for name in dict.fromkeys(spec.bone_names) if pose_bones.find(name) < 0]
+
+def get_mirror_map(armature_obj, rebuild=False):
+    """
+    Maps each `.L/.R` or `_L/_R` bone to its opposite-side bone, for the bones that have one.
+    Built once per armature and cached until its bone count changes. Renames keep the count,
+    so callers resolving a new plan pass `rebuild=True`.
+    """
+    from rigging_core import mirror_name
+    pose_bones = armature_obj.pose.bones
+    key = armature_obj.as_pointer()
+    cached = _mirror_maps.get(key)
+    if rebuild or cached is None or cached[0] != len(pose_bones):
+        names = set(pose_bones.keys())
+        mirror_map = {}
+        for name in names:
+            other = mirror_name(name)
+            if other is not None and other in names:
+                mirror_map[name] = other
+        cached = _mirror_maps[key] = (len(pose_bones), mirror_map)
+    return cached[1]
+
+def _mirror_snap_spec(spec, armature_obj, rebuild=False):
+    from rigging_core import mirror_name
+    mirror_map = get_mirror_map(armature_obj, rebuild=rebuild)
+    unmatched = [name for name in dict.fromkeys(spec.bone_names)
+                 if mirror_name(name) is not None and name not in mirror_map]
+    if unmatched:
+        raise SnapSpecError(f"Snap '{spec.name}' on '{armature_obj.name}': "
+                            f"no opposite-side bone for {', '.join(unmatched)}")
+
+    def mirrored(names):
+        return tuple(mirror_map.get(name, name) for name in names)
+    mirrored_spec = SnapSpec(f"{spec.name} (mirrored)", mirrored(spec.source_bones), mirrored(spec.target_bones),
+                             pole_bones=mirrored(spec.pole_bones) if spec.pole_bones else None,
+                             ik_chain=mirrored(spec.ik_chain) if spec.ik_chain else None)
+    # The map could still be stale, and pose_bones[-1] would silently be the last bone
+    missing = _missing_bones(mirrored_spec, armature_obj.pose.bones)
+    if missing:
+        raise SnapSpecError(f"Snap '{spec.name}' on '{armature_obj.name}': "
+                            f"missing mirrored bone(s) {', '.join(missing)}")
+    return mirrored_spec
+
+def resolve_snap_spec(armature_obj, name, mirrored=False):
+    """
+    Returns the SnapPlan of a spec on an armature, resolving and validating it on first use.
+    With `mirrored=True`, the plan runs on the opposite-side bones (see get_mirror_map).
+    Plans are cached per armature until its bone list changes. Raises SnapSpecError on missing bones.
+    """
+    registered = get_snap_spec(name)
+    pose_bones = armature_obj.pose.bones
+    key = (armature_obj.as_pointer(), name, mirrored)
+    plan = _snap_plans.get(key)
+    if plan is not None and plan.registered_spec is registered and plan.is_valid(pose_bones):
+        return plan
+
+    missing = _missing_bones(registered, pose_bones)
+    if missing:
+        raise SnapSpecError(f"Snap '{name}' on '{armature_obj.name}': missing bone(s) {', '.join(missing)}")
+    # A plan is only resolved when the bone list changed, which may have been a rename.
+    spec = _mirror_snap_spec(registered, armature_obj, rebuild=True) if mirrored else registered
+
+    index = {name: pose_bones.find(name) for name in spec.bone_names}
+    pairs = [(index[s], index[t]) for s, t in zip(spec.source_bones, spec.target_bones)]
+    pairs.sort(key=lambda pair: len(pose_bones[pair[1]].parent_recursive))
+    pole = tuple(index[n] for n in spec.pole_bones) if spec.pole_bones else None
+    ik_chain = tuple(index[n] for n in spec.ik_chain) if spec.ik_chain else None
+    plan = _snap_plans[key] = SnapPlan(spec, len(pose_bones), tuple((i, n) for n, i in index.items()), pairs, pole,
+                                       ik_chain=ik_chain, registered_spec=registered)
+    return plan
+
+def resolve_symmetric_plans(armature_obj, name):
+    """The plan of a spec plus its mirrored plan, or just the plan for a spec without sided bones."""
+    plan = resolve_snap_spec(armature_obj, name)
+    mirrored = resolve_snap_spec(armature_obj, name, mirrored=True)
+    if set(mirrored.spec.bone_names) == set(plan.spec.bone_names):
+        return [plan]
+    return [plan, mirrored]
+
+def solve_snap_plans(armature_obj, plans, matrices=None, include_poles=True):
+    """Solves several plans on one armature (e.g. both sides of a limb) before anything is written."""
+    return [write for plan in plans for write in plan.solve(armature_obj, matrices, include_poles)]
+
+def run_snap_plans(armature_obj, plans, skip_unchanged=True):
+    """Solves and writes plans with a single view layer update. Returns the written and skipped bone counts."""
+    written, skipped = _apply_pose_matrices(solve_snap_plans(armature_obj, plans), skip_unchanged)
+    if written:
+        bpy.context.view_layer.update()
+    return len(written), len(skipped)
+
+def converge_ik_snap(armature_obj, plan, tolerance=0.001, max_iterations=8):
+    """
+    Runs an FK -> IK snap, then keeps refining it until the evaluated IK chain matches the FK chain.
+    After each pass the residual is the largest distance between the root, pivot and end heads
+    of both chains. The pole is then rotated around the IK chain axis to bring the IK pivot onto
+    the FK pivot, and the IK control is corrected by the IK end's remaining offset.
+    Stops below `tolerance` or after `max_iterations` passes; returns (passes, residual).
+    """
+    from rigging_core import chain_residual, refine_pole
+    if plan.pole is None or plan.ik_chain is None:
+        raise SnapSpecError(f"Snap '{plan.spec.name}' declares no IK chain to converge on")
+    pose_bones = armature_obj.pose.bones
+    pole_bone, fk_root, fk_pivot, fk_end = (pose_bones[i] for i in plan.pole)
+    ik_root, ik_pivot, ik_end = (pose_bones[i] for i in plan.ik_chain)
+    control = pose_bones[plan.pairs[0][1]]
+
+    plan.run(armature_obj)
+    iterations = 1
+    while True:
+        residual = chain_residual([ik_root.head, ik_pivot.head, ik_end.head],
+                                  [fk_root.head, fk_pivot.head, fk_end.head])
+        if residual <= tolerance or iterations >= max_iterations:
+            return iterations, residual
+
+        pole_matrix = pole_bone.matrix.copy()
+        pole_matrix.translation = Vector(refine_pole(pole_matrix.translation, ik_root.head, ik_end.head,
+                                                     ik_pivot.head, fk_pivot.head).tolist())
+        # Move the control by whatever still separates the IK end from its FK target
+        control_matrix = _snapped_matrix(fk_end, ik_end) @ ik_end.matrix.inverted() @ control.matrix
+        if not _apply_pose_matrices([(pole_bone, pole_matrix), (control, control_matrix)])[0]:
+            # Nothing moved, so another pass would measure the same residual
+            return iterations, residual
+        bpy.context.view_layer.update()
+        iterations += 1
+
+def batch_snap(armatures, spec_name, skip_unchanged=True):
+    """
+    Runs one snap spec on many armatures. Every snap is solved before anything is written,
+    then all poses are written and the view layer is updated once for the whole batch.
+    `skip_unchanged=False` writes bones that are already in place too (see copy_bone_transform).
+    Returns the snapped armatures and {armature name: error} for the ones the spec doesn't fit.
+    """
+    plans, errors = [], {}
+    for armature_obj in armatures:
+        try:
+            plans.append((armature_obj, resolve_snap_spec(armature_obj, spec_name)))
+        except SnapSpecError as err:
+            errors[armature_obj.name] = str(err)
+
+    solved = [(armature_obj, plan.solve(armature_obj)) for armature_obj, plan in plans]
+    written = 0
+    for _, writes in solved:
+        written += len(_apply_pose_matrices(writes, skip_unchanged)[0])
+    if written:
+        bpy.context.view_layer.update()
+    return [armature_obj for armature_obj, _ in solved], errors
+
+#============================================================
+#  SOURCE MATRIX CACHE (evaluated snap inputs per frame, for repeat bakes)
+#============================================================
+# Off by default. While enabled, bakes of snap specs store the evaluated pose matrices of the bones
+# they read, and playback fills in the frames of existing caches. Later bakes over the same frames
+# read them back instead of changing frame and re-evaluating the constraint stack.
+# A cache is emptied when something of the armature it depends on changes (see _source_signature):
+# any curve of its action or driver, the unkeyed channels of its bones and its unkeyed custom
+# properties, except those of the bones the snap writes. Other objects (constraint targets,
+# driver variables reading them, their animation) and constraint settings aren't tracked;
+# call invalidate_source_matrix_cache() after changing them.
+
+# (armature object pointer, read bone names) -> SourceMatrixCache, least recently used first.
+_source_matrix_caches = OrderedDict()
+_source_matrix_budget = 0  # bytes, 0 while the cache is disabled
+# Bumped by the depsgraph handler whenever an action or an armature changes outside of playback,
+# so caches know to recheck their signature.
+_source_generation = 0
+source_matrix_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "full": 0}
+
+def _bone_path(name):
+    return f'pose.bones["{bpy.utils.escape_identifier(name)}"]'
+
+def _animated_paths(id_data):
+    """The (data path, index) pairs an ID's action or drivers set, which change from frame to frame."""
+    anim_data = id_data.animation_data
+    if anim_data is None:
+        return set()
+    fcurves = list(anim_data.drivers)
+    if anim_data.action is not None:
+        fcurves.extend(anim_data.action.fcurves)
+    return {(fcurve.data_path, fcurve.array_index) for fcurve in fcurves}
+
+def _unanimated_properties(owner, prefix, animated_paths):
+    """The custom properties of `owner` that no curve animates, as hashable (name, repr) pairs."""
+    parts = []
+    for key in owner.keys():
+        if f'{prefix}["{bpy.utils.escape_identifier(key)}"]' in animated_paths:
+            continue
+        value = owner[key]
+        for convert in ("to_dict", "to_list"):
+            if hasattr(value, convert):
+                value = getattr(value, convert)()
+                break
+        parts.append((key, repr(value)))
+    return parts
+
+def _source_signature(armature_obj, excluded_bones):
+    """
+    Hash of what the evaluated pose depends on within the armature, except for `excluded_bones`:
+    the keys, handles and settings of its action's F-curves, its drivers, the unkeyed channels
+    of the pose bones and the unkeyed custom properties of the bones, the object and its data.
+    Keyed and driven values are left out, as they change with the frame.
+    """
+    import numpy as np
+    anim_data = armature_obj.animation_data
+    action = anim_data.action if anim_data else None
+    excluded = tuple(_bone_path(name) for name in excluded_bones)
+    parts = [action.as_pointer() if action else None]
+    if action is not None:
+        for fcurve in action.fcurves:
+            if fcurve.data_path.startswith(excluded):
+                continue
+            count = len(fcurve.keyframe_points)
+            points = np.empty(count * 6, dtype=np.float32)
+            for i, attr in enumerate(("co", "handle_left", "handle_right")):
+                buffer = points[i * count * 2:(i + 1) * count * 2]
+                fcurve.keyframe_points.foreach_get(attr, buffer)
+            parts.append((fcurve.data_path, fcurve.array_index, fcurve.mute, len(fcurve.modifiers), points.tobytes()))
+    for fcurve in (anim_data.drivers if anim_data else ()):
+        driver = fcurve.driver
+        parts.append((fcurve.data_path, fcurve.array_index, fcurve.mute, driver.type, driver.expression,
+                      tuple((target.id.as_pointer() if target.id else None, target.data_path, target.bone_target,
+                             target.transform_type, target.transform_space)
+                            for variable in driver.variables for target in variable.targets)))
+
+    animated = _animated_paths(armature_obj)
+    animated_paths = {path for path, _ in animated}
+    pose_bones = armature_obj.pose.bones
+    excluded_names = set(excluded_bones)
+    # Unkeyed channels, e.g. a pose edit made without inserting a key
+    for attr, size in _SNAPSHOT_CHANNELS:
+        values = np.empty(len(pose_bones) * size, dtype=np.float32)
+        pose_bones.foreach_get(attr, values)
+        values = values.reshape(len(pose_bones), size)
+        unkeyed = np.ones(values.shape, dtype=bool)
+        for i, pose_bone in enumerate(pose_bones):
+            if pose_bone.name in excluded_names:
+                unkeyed[i] = False
+                continue
+            path = f"{_bone_path(pose_bone.name)}.{attr}"
+            if path in animated_paths:
+                for index in range(size):
+                    unkeyed[i, index] = (path, index) not in animated
+        parts.append(values[unkeyed].tobytes())
+    # Unkeyed custom properties, e.g. an FK/IK switch driving constraints
+    for pose_bone in pose_bones:
+        if pose_bone.name not in excluded_names:
+            parts.extend(_unanimated_properties(pose_bone, _bone_path(pose_bone.name), animated_paths))
+    parts.extend(_unanimated_properties(armature_obj, "", animated_paths))
+    data_paths = {path for path, _ in _animated_paths(armature_obj.data)}
+    parts.extend(_unanimated_properties(armature_obj.data, "", data_paths))
+    return hash(tuple(parts))
+
+class SourceMatrixCache:
+    """
+    Evaluated pose matrices of the bones one or more snap plans read, stored per frame
+    in a growing (frames, bones, 4, 4) float32 array.
+    """
+    def __init__(self, armature_obj, bone_names, written_bones):
+        import numpy as np
+        self.armature_name = armature_obj.name
+        self.bone_names = bone_names
+        self.written_bones = written_bones
+        self.signature = _source_signature(armature_obj, written_bones)
+        self.generation = _source_generation
+        self.rows = {}  # frame -> row of `matrices`
+        self.matrices = np.empty((0, len(bone_names), 4, 4), dtype=np.float32)
+
+    @property
+    def nbytes(self):
+        return self.matrices.nbytes
+
+    def clear(self):
+        self.rows.clear()
+        self.matrices = self.matrices[:0]
+
+    def check(self, armature_obj):
+        """Empties the cache if something it depends on changed since it was last checked."""
+        if self.generation == _source_generation:
+            return
+        self.generation = _source_generation
+        signature = _source_signature(armature_obj, self.written_bones)
+        if signature != self.signature:
+            self.signature = signature
+            self.clear()
+            source_matrix_cache_stats["invalidations"] += 1
+
+    def get(self, frame):
+        """The cached {bone name: Matrix} of a frame, or None."""
+        row = self.rows.get(frame)
+        if row is None:
+            source_matrix_cache_stats["misses"] += 1
+            return None
+        source_matrix_cache_stats["hits"] += 1
+        return {name: _to_matrix(matrix) for name, matrix in zip(self.bone_names, self.matrices[row])}
+
+    def store(self, frame, armature_obj):
+        """
+        Stores the bones' current evaluated matrices as those of `frame`. A single cache never grows
+        past the whole budget: once it's full, further frames aren't cached and this returns False.
+        """
+        import numpy as np
+        row = self.rows.get(frame, len(self.rows))
+        if row == len(self.matrices):
+            max_rows = _source_matrix_budget // (len(self.bone_names) * 16 * self.matrices.itemsize or 1)
+            if row >= max_rows:
+                source_matrix_cache_stats["full"] += 1
                 return False
+            grown = np.empty((min(max(16, 2 * row), max_rows),) + self.matrices.shape[1:], dtype=np.float32)
+            grown[:row] = self.matrices[:row]
+            self.matrices = grown
+        pose_bones = armature_obj.pose.bones
+        self.matrices[row] = [pose_bones[name].matrix for name in self.bone_names]
+        self.rows[frame] = row
+        _enforce_source_matrix_budget()
+        return True
+
+def _enforce_source_matrix_budget():
+    """
+    Drops the least recently used caches until the total is within budget. The newest one only
+    goes when it alone is over budget, e.g. after the budget was lowered.
+    """
+    total = sum(cache.nbytes for cache in _source_matrix_caches.values())
+    while total > _source_matrix_budget and _source_matrix_caches:
+        _, evicted = _source_matrix_caches.popitem(last=False)
+        total -= evicted.nbytes
+        source_matrix_cache_stats["evictions"] += 1
+
+def _cached_bones(armature_obj, plans):
+    """
+    The bones a cached solve reads (sources, pole chains and the unwritten parents of targets)
+    and the bones it writes, or None when the plans can't be solved from cached matrices.
+    """
+    pose_bones = armature_obj.pose.bones
+    read, written = {}, {}
+    for plan in plans:
+        plan_read, plan_written = plan.read_and_written_bones(armature_obj)
+        read.update(dict.fromkeys(plan_read))
+        written.update(dict.fromkeys(plan_written))
+    for name in written:
+        parent = pose_bones[name].parent
+        if parent is None or parent.name in written:
+            continue
+        # An unwritten bone between two written ones would have to be re-evaluated
+        if any(ancestor.name in written for ancestor in parent.parent_recursive):
+            return None
+        read.setdefault(parent.name)
+    return tuple(read), tuple(written)
+
+def get_source_matrix_cache(armature_obj, plans):
+    """The cache for these plans on this armature, or None while caching is disabled or not possible."""
+    if not _source_matrix_budget:
+        return None
+    bones = _cached_bones(armature_obj, plans)
+    if bones is None:
+        return None
+    key = (armature_obj.as_pointer(), bones[0])
+    cache = _source_matrix_caches.get(key)
+    if cache is None:
+        cache = _source_matrix_caches[key] = SourceMatrixCache(armature_obj, *bones)
+    else:
+        _source_matrix_caches.move_to_end(key)
+        cache.check(armature_obj)
+    return cache
+
+def invalidate_source_matrix_cache(armature_obj=None):
+    """Drops the caches of one armature, or all of them."""
+    if armature_obj is None:
+        _source_matrix_caches.clear()
+        return
+    pointer = armature_obj.as_pointer()
+    for key in [key for key in _source_matrix_caches if key[0] == pointer]:
+        del _source_matrix_caches[key]
+
+def source_matrix_cache_size():
+    """Total bytes held by the caches."""
+    return sum(cache.nbytes for cache in _source_matrix_caches.values())
+
+@persistent
+def _on_sources_updated(scene, depsgraph):
+    """Flags edits of actions and armatures. Frame changes (playback, bakes) don't run this handler."""
+    global _source_generation
+    for update in depsgraph.updates:
+        data = update.id
+        if isinstance(data, (bpy.types.Action, bpy.types.Armature)) or (
+                isinstance(data, bpy.types.Object) and data.type == 'ARMATURE'):
+            _source_generation += 1
+            return
+
+@persistent
+def _on_frame_changed(scene, depsgraph=None):
+    """Fills in the current frame of the existing caches of the scene's armatures, e.g. during playback."""
+    frame = scene.frame_current
+    for (pointer, _), cache in list(_source_matrix_caches.items()):
+        if frame in cache.rows:
+            continue
+        armature_obj = scene.objects.get(cache.armature_name)
+        if armature_obj is None or armature_obj.as_pointer() != pointer:
+            continue
+        cache.check(armature_obj)
+        cache.store(frame, armature_obj)
+
+def enable_source_matrix_cache(enabled=True, budget_mb=256):
+    """Turns the source matrix cache on (with a memory budget) or off, dropping everything it held."""
+    global _source_matrix_budget
+    _source_matrix_budget = int(budget_mb * 1024 * 1024) if enabled else 0
+    for handlers, handler in ((bpy.app.handlers.depsgraph_update_post, _on_sources_updated),
+                              (bpy.app.handlers.frame_change_post, _on_frame_changed)):
+        if enabled and handler not in handlers:
+            handlers.append(handler)
+        elif not enabled and handler in handlers:
+            handlers.remove(handler)
+    if enabled:
+        _enforce_source_matrix_budget()
+    else:
+        _source_matrix_caches.clear()
+
+def is_source_matrix_cache_enabled():
+    return _source_matrix_budget > 0
+
+#============================================================
+#  POSE SNAPSHOTS (bulk NumPy copies of a whole pose)
+#============================================================
+_SNAPSHOT_CHANNELS = (
+    ("location", 3),
+    ("rotation_quaternion", 4),
+    ("rotation_euler", 3),
+    ("rotation_axis_angle", 4),
+    ("scale", 3),
+)
+
+class PoseSnapshot:
+    """
+    Contiguous NumPy copy of every pose bone of an armature, in `pose.bones` order.
+    Channels are (bones, n) arrays; `matrix` (pose space) and `matrix_world` are (bones, 4, 4),
+    laid out row-major like mathutils (matrix[b][row][col]).
+    """
+    def __init__(self, bone_names, channels, matrix, matrix_world):
+        self.bone_names = bone_names
+        self.channels = channels
+        self.matrix = matrix
+        self.matrix_world = matrix_world
+        self._name_index = None
+
+    def index_of(self, names):
+        """Returns the snapshot indices of the given bone names, as an integer array."""
+        import numpy as np
+        if self._name_index is None:
+            self._name_index = {name: i for i, name in enumerate(self.bone_names)}
+        return np.fromiter((self._name_index[name] for name in names), dtype=np.intp, count=len(names))
+
+def capture_pose(armature_obj):
+    """Reads the channels and evaluated matrices of all pose bones with one foreach_get per property."""
+    import numpy as np
+    pose_bones = armature_obj.pose.bones
+    count = len(pose_bones)
+    channels = {}
+    for attr, size in _SNAPSHOT_CHANNELS:
+        buffer = np.empty(count * size, dtype=np.float32)
+        pose_bones.foreach_get(attr, buffer)
+        channels[attr] = buffer.reshape(count, size)
+
+    buffer = np.empty(count * 16, dtype=np.float32)
+    pose_bones.foreach_get("matrix", buffer)
+    # Blender stores matrices column-major, transpose to mathutils' row-major indexing.
+    matrix = np.ascontiguousarray(buffer.reshape(count, 4, 4).transpose(0, 2, 1))
+    matrix_world = np.asarray(armature_obj.matrix_world, dtype=np.float32) @ matrix
+
+    return PoseSnapshot(tuple(pbone.name for pbone in pose_bones), channels, matrix, matrix_world)
+
+def restore_pose(armature_obj, snapshot, update=True):
+    """Writes a snapshot's channels back with one foreach_set per property, e.g. to undo a snap."""
+    pose_bones = armature_obj.pose.bones
+    if len(pose_bones) != len(snapshot.bone_names):
+        raise ValueError(f"Snapshot has {len(snapshot.bone_names)} bones, "
+                         f"'{armature_obj.name}' has {len(pose_bones)}")
+    for attr, _ in _SNAPSHOT_CHANNELS:
+        pose_bones.foreach_set(attr, snapshot.channels[attr].ravel())
+    # foreach_set bypasses RNA updates, so the pose has to be tagged by hand.
+    armature_obj.update_tag(refresh={'DATA'})
+    if update:
+        bpy.context.view_layer.update()
+
+def moved_bones(before, after, tolerance=0.0001):
+    """Names of the bones whose pose matrix differs between two snapshots of the same armature."""
+    import numpy as np
+    from rigging_core import matrices_fuzzy_equal_batch
+    unchanged = matrices_fuzzy_equal_batch(before.matrix, after.matrix, tolerance)
+    return [before.bone_names[i] for i in np.flatnonzero(~unchanged)]
+
+def dump_rig_transforms(scene, armature_obj, filepath, frames):
+    """
+    Streams every pose bone's local channels and world matrix, plus the rest matrices,
+    over `frames` to a transform dump (see rigging_core.TransformDumpWriter).
+    One frame is captured and written at a time, so memory stays flat on long shots.
+    Compare two dumps with rigging_core.diff_transform_dumps, or `python rigging_core.py diff`.
+    """
+    import numpy as np
+    from rigging_core import DUMP_FIELDS, TransformDumpWriter
+    frames = list(frames)
+    pose_bones = armature_obj.pose.bones
+    rest = np.array([pbone.bone.matrix_local for pbone in pose_bones], dtype=np.float32)
+    frame_current = scene.frame_current
+    try:
+        with TransformDumpWriter(filepath, [pbone.name for pbone in pose_bones], frames, rest,
+                                 armature_name=armature_obj.name) as writer:
+            for frame in frames:
+                scene.frame_set(frame)
+                snapshot = capture_pose(armature_obj)
+                writer.write_frame(np.concatenate(
+                    [snapshot.channels[name] if name != "matrix_world" else snapshot.matrix_world.reshape(-1, 16)
+                     for name, _ in DUMP_FIELDS], axis=1))
+    finally:
+        scene.frame_set(frame_current)
+    return len(frames)
+
+
+#============================================================
+#  VISIBILITY PRESETS (named collection visibility/solo states stored on the armature)
+#============================================================
+def get_visibility_preset(armature_data, name):
+    return armature_data.rig_visibility_presets.get(name)
+
+def set_visibility_preset(armature_data, name, states):
+    """
+    Stores {collection name: (is_visible, is_solo)} as the preset `name`, replacing any previous one.
+    Rig scripts can use it to ship presets like "FK only"; capture_visibility_preset records the current state.
+    """
+    presets = armature_data.rig_visibility_presets
+    preset = presets.get(name)
+    if preset is None:
+        preset = presets.add()
+        preset.name = name
+    preset.entries.clear()
+    for collection_name, (is_visible, is_solo) in states.items():
+        entry = preset.entries.add()
+        entry.name = collection_name
+        entry.is_visible = is_visible
+        entry.is_solo = is_solo
+    return preset
+
+def capture_visibility_preset(armature_data, name):
+    """Records the visibility and solo state of every bone collection, at any nesting depth."""
+    return set_visibility_preset(armature_data, name, {coll.name: (coll.is_visible, coll.is_solo)
+                                                       for coll in armature_data.collections_all})
+
+def apply_visibility_preset(armature_data, name):
+    """
+    Applies a stored preset through the cached collection index. Only states that differ are written,
+    so each collection triggers at most one update. Returns (changed, missing collection names).
+    """
+    preset = get_visibility_preset(armature_data, name)
+    if preset is None:
+        raise KeyError(f"No visibility preset '{name}' on '{armature_data.name}'")
+    changed, missing = 0, []
+    for entry in preset.entries:
+        collection = find_bone_collection(armature_data, entry.name)
+        if collection is None:
+            missing.append(entry.name)
+            continue
+        if collection.is_visible != entry.is_visible or collection.is_solo != entry.is_solo:
+            collection.is_visible = entry.is_visible
+            collection.is_solo = entry.is_solo
+            changed += 1
+    return changed, missing
+
+def remove_visibility_preset(armature_data, name):
+    presets = armature_data.rig_visibility_presets
+    i = presets.find(name)
+    if i < 0:
+        return False
+    presets.remove(i)
     return True
 
+#============================================================
+#  PROFILING (opt-in timing of operators and UI drawing)
+#============================================================
+_PROFILE_BUFFER_SIZE = 4096
+
+# Ring buffer of (call site, wall time in seconds, depsgraph updates during the call)
+_profile_samples = deque(maxlen=_PROFILE_BUFFER_SIZE)
+_profiling_enabled = False
+_depsgraph_update_count = 0
+
+@persistent
+def _count_depsgraph_update(*args):
+    global _depsgraph_update_count
+    _depsgraph_update_count += 1
+
+def profiled(func):
+    """
+    Records the wall time, call count and depsgraph updates of `func` while profiling is enabled.
+    When it's disabled, the only overhead is one extra call and a flag check.
+    Operator and panel methods keep their (self, context) signature, which Blender checks on registration.
+    """
+    site = func.__qualname__
+
+    def record(start, updates):
+        _profile_samples.append((site, time.perf_counter() - start, _depsgraph_update_count - updates))
+
+    if func.__code__.co_varnames[:func.__code__.co_argcount] == ('self', 'context'):
+        @functools.wraps(func)
+        def wrapper(self, context):
+            if not _profiling_enabled:
+                return func(self, context)
+            start, updates = time.perf_counter(), _depsgraph_update_count
+            try:
+                return func(self, context)
+            finally:
+                record(start, updates)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _profiling_enabled:
+                return func(*args, **kwargs)
+            start, updates = time.perf_counter(), _depsgraph_update_count
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(start, updates)
+    return wrapper
+
+def enable_profiling(enabled=True):
+    """Turns profiling on or off. The depsgraph counter is only hooked while profiling."""
+    global _profiling_enabled
+    _profiling_enabled = enabled
+    handlers = bpy.app.handlers.depsgraph_update_post
+    if enabled and _count_depsgraph_update not in handlers:
+        handlers.append(_count_depsgraph_update)
+    elif not enabled and _count_depsgraph_update in handlers:
+        handlers.remove(_count_depsgraph_update)
+
+def is_profiling_enabled():
+    return _profiling_enabled
+
+def clear_profile():
+    _profile_samples.clear()
+
+def profile_stats():
+    """Per call site: call count, p50/p95/max wall time (seconds) and depsgraph updates, from the ring buffer."""
+    import numpy as np
+    samples_by_site = {}
+    for site, seconds, updates in _profile_samples:
+        samples_by_site.setdefault(site, []).append((seconds, updates))
+
+    stats = {}
+    for site, samples in samples_by_site.items():
+        times = np.array([seconds for seconds, _ in samples])
+        p50, p95 = np.percentile(times, (50, 95))
+        stats[site] = {
+            "calls": len(samples),
+            "p50": float(p50),
+            "p95": float(p95),
+            "max": float(times.max()),
+            "total": float(times.sum()),
+            "depsgraph_updates": sum(updates for _, updates in samples),
+        }
+    return stats
+
+def export_profile(filepath):
+    """Writes the per-site stats and the raw samples to a JSON file."""
+    import json
+    data = {
+        "stats": profile_stats(),
+        "samples": [{"site": site, "seconds": seconds, "depsgraph_updates": updates}
+                    for site, seconds, updates in _profile_samples],
+    }
+    with open(filepath, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
 #============================================================
 #  GENERIC OPERATOR CLASSES (The "Tools")
 #============================================================
 
-class RIG_OT_snap_bone_chain(bpy.types.Operator):
+class RigSnapBakeProperties:
+    """Spec and frame-range bake options shared by the snapping operators."""
+    spec: bpy.props.StringProperty(
+        name="Snap Spec",
+        description="Name of a snap declared with register_snap_chain or register_ik_snap. "
+                    "When set, the bone name properties are ignored",
+    )
+    symmetric: bpy.props.BoolProperty(
+        name="Symmetric",
+        description="Also snap the mirrored .L/.R (or _L/_R) counterpart of the spec, in the same pass",
+        default=False,
+    )
+    bake: bpy.props.BoolProperty(name="Bake", description="Snap and key every frame of a frame range", default=False)
+    frame_start: bpy.props.IntProperty(name="Start Frame", description="First frame to bake (defaults to the scene start)")
+    frame_end: bpy.props.IntProperty(name="End Frame", description="Last frame to bake (defaults to the scene end)")
+    frame_step: bpy.props.IntProperty(name="Frame Step", default=1, min=1)
+    only_existing_keys: bpy.props.BoolProperty(
+        name="Only Existing Keys",
+        description="Only bake frames that already hold a key on one of the snapped bones",
+        default=False,
+    )
+
+    def get_bake_frames(self, context, bone_names):
+        scene = context.scene
+        frame_start = self.frame_start if self.properties.is_property_set("frame_start") else scene.frame_start
+        frame_end = self.frame_end if self.properties.is_property_set("frame_end") else scene.frame_end
+        if self.only_existing_keys:
+            frames = get_key_frames(context.active_object, bone_names, frame_start, frame_end)
+            return frames[::self.frame_step]
+        return range(frame_start, frame_end + 1, self.frame_step)
+
+    def resolve_plans(self, armature):
+        """The plans of the operator's spec (both sides if symmetric), or None after reporting the error."""
+        try:
+            if self.symmetric:
+                return resolve_symmetric_plans(armature, self.spec)
+            return [resolve_snap_spec(armature, self.spec)]
+        except SnapSpecError as err:
+            self.report({'ERROR'}, str(err))
+            return None
+
+    def execute_snap_spec(self, context):
+        """Runs (or bakes) the registered spec named by the operator's `spec` property, on one or both sides."""
+        armature = context.active_object
+        plans = self.resolve_plans(armature)
+        if plans is None:
+            return {'CANCELLED'}
+        if self.bake:
+            bone_names = [name for plan in plans for name in plan.spec.bone_names]
+            frames = self.get_bake_frames(context, bone_names)
+            baked = bake_snap(context.scene, armature, frames,
+                              lambda rig, matrices=None: solve_snap_plans(rig, plans, matrices, include_poles=False),
+                              cache=get_source_matrix_cache(armature, plans),
+                              poles=[plan.pole_bones(armature) for plan in plans if plan.pole is not None])
+            self.report({'INFO'}, f"Baked {baked} frame(s)")
+        else:
+            self.report_snap(*run_snap_plans(armature, plans))
+        return {'FINISHED'}
+
+    def report_snap(self, written, skipped):
+        self.report({'INFO'}, f"Snapped {written} bone(s), skipped {skipped} already in place")
+
+class RIG_OT_snap_bone_chain(RigSnapBakeProperties, bpy.types.Operator):
     bl_idname = "rig.snap_bone_chain"
     bl_label = "Snap Bone Chain"
     bl_options = {'REGISTER', 'UNDO'}
 
     source_bones: bpy.props.StringProperty()
     target_bones: bpy.props.StringProperty()
+    per_bone_update: bpy.props.BoolProperty(
+        name="Per-Bone Update",
+        description="Use the legacy path that updates the view layer after every bone (slower, for comparison)",
+        default=False,
+    )
 
     @classmethod
     def poll(cls, context):
         return context.active_object and context.active_object.type == 'ARMATURE'
 
+    @profiled
     def execute(self, context):
+        if self.per_bone_update and self.bake:
+            self.report({'WARNING'}, "Per-bone update doesn't apply to bakes, baking with the single-update path")
+        if self.spec and (self.bake or not self.per_bone_update):
+            return self.execute_snap_spec(context)
         armature = context.active_object
+        if self.spec:
+            plans = self.resolve_plans(armature)
+            if plans is None:
+                return {'CANCELLED'}
+            counts = [copy_bone_chain(plan.spec.source_bones, plan.spec.target_bones, armature, per_bone_update=True)
+                      for plan in plans]
+            self.report_snap(sum(written for written, _ in counts), sum(skipped for _, skipped in counts))
+            return {'FINISHED'}
         source_names = [name.strip() for name in self.source_bones.split(',')]
         target_names = [name.strip() for name in self.target_bones.split(',')]
-        copy_bone_chain(source_names, target_names, armature)
+        if self.bake:
+            frames = self.get_bake_frames(context, source_names + target_names)
+            baked = bake_snap(context.scene, armature, frames,
+                              lambda rig: _solve_bone_chain(source_names, target_names, rig))
+            self.report({'INFO'}, f"Baked {baked} frame(s)")
+            return {'FINISHED'}
+        self.report_snap(*copy_bone_chain(source_names, target_names, armature, per_bone_update=self.per_bone_update))
         return {'FINISHED'}
     
-class RIG_OT_snap_to_ik_with_pole(bpy.types.Operator):
+class RIG_OT_snap_to_ik_with_pole(RigSnapBakeProperties, bpy.types.Operator):
     bl_idname = "rig.snap_to_ik_with_pole"
     bl_label = "Snap to IK (with Pole)"
     bl_options = {'REGISTER', 'UNDO'}
@@ -97,17 +1359,188 @@ class RIG_OT_snap_to_ik_with_pole(bpy.types.Operator):
     source_end_bone: bpy.props.StringProperty()
     source_chain_root: bpy.props.StringProperty()
     source_chain_pivot: bpy.props.StringProperty()
+    converge: bpy.props.BoolProperty(
+        name="Converge",
+        description="Refine the pole and IK control until the IK chain matches the FK chain "
+                    "(needs a spec declaring its IK chain)",
+        default=False,
+    )
+    tolerance: bpy.props.FloatProperty(name="Tolerance", default=0.001, min=0.0, precision=5, subtype='DISTANCE')
+    max_iterations: bpy.props.IntProperty(name="Max Iterations", default=8, min=1, max=100)
 
     @classmethod
     def poll(cls, context):
         return context.active_object and context.active_object.type == 'ARMATURE'
 
+    @profiled
     def execute(self, context):
+        if self.converge and (self.bake or not self.spec):
+            self.report({'WARNING'}, "Converge needs a snap spec and isn't used when baking, "
+                                     "running the plain snap instead")
+        elif self.converge:
+            return self.execute_converge(context)
+        if self.spec:
+            return self.execute_snap_spec(context)
         armature = context.active_object
-        snap_pole_vector(self.pole_control_bone, self.source_chain_root, self.source_chain_pivot, self.source_end_bone, armature)
-        copy_bone_transform(armature.pose.bones[self.source_end_bone], armature.pose.bones[self.ik_control_bone])
+        if self.bake:
+            bone_names = [self.ik_control_bone, self.pole_control_bone, self.source_end_bone,
+                          self.source_chain_root, self.source_chain_pivot]
+            frames = self.get_bake_frames(context, bone_names)
+            pose_bones = armature.pose.bones
+            pole_chain = [self.pole_control_bone, self.source_chain_root, self.source_chain_pivot, self.source_end_bone]
+            poles = [tuple(pose_bones[name] for name in pole_chain)] if all(n in pose_bones for n in pole_chain) else []
+            baked = bake_snap(context.scene, armature, frames,
+                              lambda rig: _solve_bone_chain([self.source_end_bone], [self.ik_control_bone], rig),
+                              poles=poles)
+            self.report({'INFO'}, f"Baked {baked} frame(s)")
+            return {'FINISHED'}
+        # The FK source doesn't depend on the pole, so both are solved first and written with one update.
+        written, skipped = _apply_pose_matrices(_solve_ik_snap(self.ik_control_bone, self.pole_control_bone, self.source_end_bone,
+                                                               self.source_chain_root, self.source_chain_pivot, armature))
+        if written:
+            context.view_layer.update()
+        self.report_snap(len(written), len(skipped))
         return {'FINISHED'}    
 
+    def execute_converge(self, context):
+        armature = context.active_object
+        plans = self.resolve_plans(armature)
+        if plans is None:
+            return {'CANCELLED'}
+        try:
+            results = [converge_ik_snap(armature, plan, self.tolerance, self.max_iterations) for plan in plans]
+        except SnapSpecError as err:
+            self.report({'ERROR'}, str(err))
+            return {'CANCELLED'}
+        iterations = max(passes for passes, _ in results)
+        residual = max(error for _, error in results)
+        level = 'INFO' if residual <= self.tolerance else 'WARNING'
+        self.report({level}, f"Snapped in {iterations} pass(es), residual {residual:.5f}")
+        return {'FINISHED'}
+
+class RIG_OT_batch_snap(bpy.types.Operator):
+    """Runs a snap spec on every selected armature, or on every armature of a collection, as one undo step."""
+    bl_idname = "rig.batch_snap"
+    bl_label = "Batch Snap"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    spec: bpy.props.StringProperty(name="Snap Spec", description="Name of a registered snap spec")
+    scope: bpy.props.EnumProperty(
+        name="Scope",
+        items=[
+            ('SELECTED', "Selected", "All selected armatures"),
+            ('COLLECTION', "Collection", "All armatures in a collection, including its children"),
+        ],
+        default='SELECTED',
+    )
+    collection: bpy.props.StringProperty(name="Collection", description="Collection to snap when the scope is Collection")
+
+    def get_armatures(self, context):
+        if self.scope == 'COLLECTION':
+            collection = bpy.data.collections.get(self.collection)
+            objects = collection.all_objects if collection else []
+        else:
+            objects = context.selected_objects
+        return [obj for obj in objects if obj.type == 'ARMATURE']
+
+    @profiled
+    def execute(self, context):
+        armatures = self.get_armatures(context)
+        if not armatures:
+            self.report({'WARNING'}, "No armatures to snap")
+            return {'CANCELLED'}
+        snapped, errors = batch_snap(armatures, self.spec)
+        for message in errors.values():
+            self.report({'WARNING'}, message)
+        self.report({'INFO'}, f"Snapped {len(snapped)} of {len(armatures)} armature(s)")
+        return {'FINISHED'} if snapped else {'CANCELLED'}
+
+class RIG_OT_apply_visibility_preset(bpy.types.Operator):
+    """Sets the visibility and solo state of all bone collections from a stored preset, as one undo step."""
+    bl_idname = "rig.apply_visibility_preset"
+    bl_label = "Apply Visibility Preset"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    preset: bpy.props.StringProperty(name="Preset")
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    @profiled
+    def execute(self, context):
+        try:
+            changed, missing = apply_visibility_preset(context.active_object.data, self.preset)
+        except KeyError as err:
+            self.report({'ERROR'}, str(err))
+            return {'CANCELLED'}
+        if missing:
+            self.report({'WARNING'}, f"Missing collections: {', '.join(missing)}")
+        self.report({'INFO'}, f"'{self.preset}': changed {changed} collection(s)")
+        return {'FINISHED'}
+
+class RIG_OT_capture_visibility_preset(bpy.types.Operator):
+    """Stores the current visibility and solo state of all bone collections as a preset."""
+    bl_idname = "rig.capture_visibility_preset"
+    bl_label = "Capture Visibility Preset"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    preset: bpy.props.StringProperty(name="Preset", default="Preset")
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    @profiled
+    def execute(self, context):
+        if not self.preset:
+            self.report({'ERROR'}, "A preset needs a name")
+            return {'CANCELLED'}
+        preset = capture_visibility_preset(context.active_object.data, self.preset)
+        self.report({'INFO'}, f"Captured {len(preset.entries)} collection(s) as '{self.preset}'")
+        return {'FINISHED'}
+
+class RIG_OT_remove_visibility_preset(bpy.types.Operator):
+    """Deletes a stored visibility preset."""
+    bl_idname = "rig.remove_visibility_preset"
+    bl_label = "Remove Visibility Preset"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    preset: bpy.props.StringProperty(name="Preset")
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    def execute(self, context):
+        if not remove_visibility_preset(context.active_object.data, self.preset):
+            self.report({'WARNING'}, f"No visibility preset '{self.preset}'")
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+class RIG_OT_validate_rig(bpy.types.Operator):
+    """Checks the bones, collections, properties and constraints the active rig's UI and snaps reference."""
+    bl_idname = "rig.validate_rig"
+    bl_label = "Validate Rig"
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    @profiled
+    def execute(self, context):
+        report = validate_rig_panels(context.active_object)
+        for issue in report.issues:
+            self.report({issue.severity}, f"{issue.category} '{issue.name}': {issue.message} {issue.source}".rstrip())
+        self.report({'INFO'} if report.ok else {'WARNING'}, report.summary())
+        # The panel lists the issues too
+        if context.area is not None:
+            context.area.tag_redraw()
+        return {'FINISHED'}
+
 class DEBUG_OT_dissect_bone_matrix(bpy.types.Operator):
     """Prints the full transform hierarchy for the active bone."""
     bl_idname = "debug.dissect_bone_matrix"
@@ -118,6 +1551,7 @@ class DEBUG_OT_dissect_bone_matrix(bpy.types.Operator):
         """Ensure the operator can only be run when a bone is selected in Pose Mode."""
         return context.active_pose_bone is not None
 
+    @profiled
     def execute(self, context):
         pbone = context.active_pose_bone
         armature_obj = context.active_object
@@ -161,6 +1595,82 @@ class DEBUG_OT_dissect_bone_matrix(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class DEBUG_OT_dump_rig_transforms(bpy.types.Operator, ExportHelper):
+    """Streams the whole rig's transforms over a frame range to a binary dump, for diffing rigs across changes."""
+    bl_idname = "debug.dump_rig_transforms"
+    bl_label = "Dump Rig Transforms"
+
+    filename_ext = ".rigdump"
+    filter_glob: bpy.props.StringProperty(default="*.rigdump", options={'HIDDEN'})
+    frame_start: bpy.props.IntProperty(name="Start Frame", description="First frame to dump (defaults to the scene start)")
+    frame_end: bpy.props.IntProperty(name="End Frame", description="Last frame to dump (defaults to the scene end)")
+    frame_step: bpy.props.IntProperty(name="Frame Step", default=1, min=1)
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        if not self.properties.is_property_set("frame_start"):
+            self.frame_start = context.scene.frame_start
+        if not self.properties.is_property_set("frame_end"):
+            self.frame_end = context.scene.frame_end
+        return ExportHelper.invoke(self, context, event)
+
+    @profiled
+    def execute(self, context):
+        # Called from a script, invoke() never ran, so fall back to the scene range here too
+        scene = context.scene
+        frame_start = self.frame_start if self.properties.is_property_set("frame_start") else scene.frame_start
+        frame_end = self.frame_end if self.properties.is_property_set("frame_end") else scene.frame_end
+        frames = range(frame_start, frame_end + 1, self.frame_step)
+        count = dump_rig_transforms(context.scene, context.active_object, self.filepath, frames)
+        self.report({'INFO'}, f"Dumped {count} frame(s) to {self.filepath}")
+        return {'FINISHED'}
+
+class DEBUG_OT_toggle_profiling(bpy.types.Operator):
+    """Starts or stops timing operators and rig UI drawing."""
+    bl_idname = "debug.toggle_profiling"
+    bl_label = "Toggle Profiling"
+
+    def execute(self, context):
+        enable_profiling(not is_profiling_enabled())
+        return {'FINISHED'}
+
+class DEBUG_OT_toggle_source_matrix_cache(bpy.types.Operator):
+    """Starts or stops caching the evaluated source bones of snap bakes, per frame. Edits of the rig's keys, drivers, pose and custom properties empty the cache; changes to other objects or to constraint settings don't, so toggle it off and on after those."""
+    bl_idname = "debug.toggle_source_matrix_cache"
+    bl_label = "Toggle Source Matrix Cache"
+
+    budget_mb: bpy.props.IntProperty(name="Budget (MB)", default=256, min=1)
+
+    def execute(self, context):
+        enable_source_matrix_cache(not is_source_matrix_cache_enabled(), self.budget_mb)
+        return {'FINISHED'}
+
+class DEBUG_OT_clear_profile(bpy.types.Operator):
+    """Clears the recorded timings."""
+    bl_idname = "debug.clear_profile"
+    bl_label = "Clear Profile"
+
+    def execute(self, context):
+        clear_profile()
+        return {'FINISHED'}
+
+class DEBUG_OT_export_profile(bpy.types.Operator, ExportHelper):
+    """Exports the recorded timings to a JSON file."""
+    bl_idname = "debug.export_profile"
+    bl_label = "Export Profile"
+
+    filename_ext = ".json"
+    filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+
+    def execute(self, context):
+        export_profile(self.filepath)
+        self.report({'INFO'}, f"Profile written to {self.filepath}")
+        return {'FINISHED'}
+
+
 #============================================================
 #  STATE MANAGEMENT CLASSES 
 #============================================================
@@ -168,21 +1678,50 @@ class DEBUG_OT_dissect_bone_matrix(bpy.types.Operator):
 class RigUIStateItem(bpy.types.PropertyGroup):
     is_expanded: bpy.props.BoolProperty(name="Is Expanded", default=True)
 
+# Manager pointer -> (item count, {box_id: item index}), rebuilt lazily and dropped on file load and undo.
+_box_state_indices = {}
+# Defaults handed in by the drawing code. They stay in memory until a box is actually toggled,
+# so drawing a panel never writes to the window manager.
+_box_state_defaults = {}
+
 class RigUIStateManager(bpy.types.PropertyGroup):
     box_states: bpy.props.CollectionProperty(type=RigUIStateItem)
 
-    def get_box_state(self, box_id, default=True):
-        if box_id not in self.box_states:
-            item = self.box_states.add()
-            item.name = box_id
-            item.is_expanded = default
-        return self.box_states[box_id].is_expanded
+    def _box_index(self):
+        key = self.as_pointer()
+        cached = _box_state_indices.get(key)
+        if cached is None or cached[0] != len(self.box_states):
+            cached = (len(self.box_states), {item.name: i for i, item in enumerate(self.box_states)})
+            _box_state_indices[key] = cached
+        return cached[1]
+
+    def get_box_state(self, box_id, default=None):
+        """Side-effect free: a box that was never toggled reports its default."""
+        i = self._box_index().get(box_id)
+        if i is not None:
+            return self.box_states[i].is_expanded
+        if default is None:
+            return _box_state_defaults.get(box_id, True)
+        _box_state_defaults[box_id] = default
+        return default
 
     def set_box_state(self, box_id, value):
-        if box_id not in self.box_states:
+        index = self._box_index()
+        i = index.get(box_id)
+        if i is None:
             item = self.box_states.add()
             item.name = box_id
-        self.box_states[box_id].is_expanded = value
+            i = len(self.box_states) - 1
+            _box_state_indices[self.as_pointer()] = (len(self.box_states), {**index, box_id: i})
+        self.box_states[i].is_expanded = value
+
+class RigVisibilityPresetEntry(bpy.types.PropertyGroup):
+    # `name` is the bone collection's name
+    is_visible: bpy.props.BoolProperty(name="Visible", default=True)
+    is_solo: bpy.props.BoolProperty(name="Solo", default=False)
+
+class RigVisibilityPreset(bpy.types.PropertyGroup):
+    entries: bpy.props.CollectionProperty(type=RigVisibilityPresetEntry)
 
 class WM_OT_RigUIToggleBox(bpy.types.Operator):
     """A simple operator to toggle the expanded state of a box."""
@@ -192,6 +1731,7 @@ class WM_OT_RigUIToggleBox(bpy.types.Operator):
 
     box_id: bpy.props.StringProperty()
 
+    @profiled
     def execute(self, context):
         # This is where you can add your debug print statement!
         print(f"Toggling box with ID: {self.box_id}") 
@@ -201,16 +1741,20 @@ class WM_OT_RigUIToggleBox(bpy.types.Operator):
         state_manager.set_box_state(self.box_id, not current_state)
         
         # This forces the UI to redraw immediately after the state changes.
-        # It's important for responsiveness.
-        for region in context.area.regions:
-            if region.type == 'UI':
-                region.tag_redraw()
+        # It's important for responsiveness. Only the region the button lives in needs it.
+        if context.region is not None:
+            context.region.tag_redraw()
+        elif context.area is not None:
+            for region in context.area.regions:
+                if region.type == 'UI':
+                    region.tag_redraw()
                 
         return {'FINISHED'}
 
 #============================================================
 #  REUSABLE UI DRAWING FUNCTION (The "UI Component")
 #============================================================
+@profiled
 def draw_collapsible_box(layout, context, box_id, text, icon='NONE', default_expanded=True):
     state_manager = context.window_manager.rig_ui_state
     is_expanded = state_manager.get_box_state(box_id, default=default_expanded)
@@ -233,17 +1777,19 @@ def draw_collapsible_box(layout, context, box_id, text, icon='NONE', default_exp
         return box.column()
     return None
 
-def draw_collection_button(layout, collection_name, text=None, show_solo_button=False):
+@profiled
+def draw_collection_button(layout, collection_name, text=None, show_solo_button=False, armature_obj=None):
     """
     Draws a visibility toggle for a bone collection, with an optional built-in solo button.
-    This version includes a recursive search to handle nested collections.
+    Nested collections are looked up through a cached index (see find_bone_collection).
+    The collection belongs to `armature_obj`, or to the active armature when it isn't given.
     """
-    rig = bpy.context.active_object
+    rig = armature_obj or bpy.context.active_object
     if not (rig and rig.type == 'ARMATURE'):
         return
 
-    # Use the recursive helper function to find the collection
-    collection = _find_collection_recursive(rig.data.collections, collection_name)
+    # Nested collections are found through the cached name index
+    collection = find_bone_collection(rig.data, collection_name)
     
     if collection is None:
         layout.label(text=f"'{collection_name}'?", icon='ERROR')
@@ -260,42 +1806,492 @@ def draw_collection_button(layout, collection_name, text=None, show_solo_button=
     else:
         layout.prop(collection, 'is_visible', text=text, toggle=True)
 
+def draw_visibility_presets(layout):
+    """One button per visibility preset of the active armature, plus capture and remove buttons."""
+    rig = bpy.context.active_object
+    if not (rig and rig.type == 'ARMATURE'):
+        return
+    col = layout.column(align=True)
+    for preset in rig.data.rig_visibility_presets:
+        row = col.row(align=True)
+        row.operator("rig.apply_visibility_preset", text=preset.name, icon='HIDE_OFF').preset = preset.name
+        row.operator("rig.remove_visibility_preset", text="", icon='X').preset = preset.name
+    col.operator("rig.capture_visibility_preset", text="Capture Current", icon='ADD')
+
+def draw_source_matrix_cache_section(layout):
+    """Source matrix cache toggle and usage, for a rig panel's debug box."""
+    cached = is_source_matrix_cache_enabled()
+    row = layout.row(align=True)
+    row.operator("debug.toggle_source_matrix_cache", text="Matrix Cache", icon='FILE_CACHE', depress=cached)
+    if cached:
+        row.label(text=f"{source_matrix_cache_size() / (1024 * 1024):.1f} MB, "
+                       f"{source_matrix_cache_stats['hits']} hits")
+
+def draw_profiling_section(layout, max_rows=12):
+    """Profiling controls and the slowest call sites (by p95), for a rig panel's debug box."""
+    enabled = is_profiling_enabled()
+    row = layout.row(align=True)
+    row.operator("debug.toggle_profiling", text="Stop Profiling" if enabled else "Start Profiling",
+                 icon='PAUSE' if enabled else 'PLAY', depress=enabled)
+    row.operator("debug.clear_profile", text="", icon='TRASH')
+    row.operator("debug.export_profile", text="", icon='EXPORT')
+
+    stats = profile_stats()
+    if not stats:
+        return
+    col = layout.column(align=True)
+    row = col.row()
+    row.label(text="Call site")
+    row.label(text="Calls / p50 / p95 (ms)")
+    for site, site_stats in sorted(stats.items(), key=lambda item: item[1]["p95"], reverse=True)[:max_rows]:
+        row = col.row()
+        row.label(text=site)
+        row.label(text=f"{site_stats['calls']} / {site_stats['p50'] * 1e3:.2f} / {site_stats['p95'] * 1e3:.2f}")
+
+
+#============================================================
+#  DECLARATIVE RIG UI (a spec compiled once into a cached draw plan)
+#============================================================
+# A rig UI spec is a dict (or JSON file) of collapsible boxes, each holding rows of items:
+#
+#   {"boxes": [
+#       {"id": "donald_core", "text": "Core", "icon": "MOD_ARMATURE", "expanded": True,
+#        "rows": [[{"collection": "def"}, {"collection": "mch", "solo": True}],
+#                 [{"snap": "donald.arm_fk.L", "text": "Arms < FK", "symmetric": True}],
+#                 [{"property": "arm_fk_ik.L", "bone": "properties", "text": "Arm FK/IK L"}],
+#                 [{"operator": "debug.dissect_bone_matrix", "icon": "CONSOLE"}],
+#                 [{"draw": "profiling"}]]},
+#   ]}
+#
+# "snap" picks the IK or chain snap operator from the registered spec, "property" draws a custom
+# property of a pose bone (as a slider unless "slider" is False) and "draw" names an entry of
+# RIG_UI_DRAWERS, or is any callable taking the layout.
+
+class RigUISpecError(Exception):
+    pass
+
+# Named drawing callbacks a spec can reference from JSON.
+RIG_UI_DRAWERS = {
+    "profiling": draw_profiling_section,
+    "matrix_cache": draw_source_matrix_cache_section,
+    "visibility_presets": draw_visibility_presets,
+}
+
+# id(spec) -> RigUIPlan
+_rig_ui_plans = {}
+rig_ui_plan_stats = {"compiles": 0, "draws": 0}
+
+class RigUIPlan:
+    """
+    A rig UI spec compiled into flat (kind, args) steps: labels, operators, snap specs and drawers
+    are resolved once. Collections and properties are kept by name and looked up on each redraw,
+    collections through the cached index of find_bone_collection, so the plan never holds rig data.
+    """
+    def __init__(self, spec, boxes):
+        self.spec = spec  # keeps id(spec) from being reused while the plan is cached
+        self.boxes = boxes  # ((box_id, text, icon, expanded, rows), ...), rows being tuples of steps
+
+def load_rig_ui_spec(filepath):
+    """Reads a rig UI spec from a JSON file."""
+    import json
+    with open(filepath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _compile_rig_ui_item(item):
+    if "collection" in item:
+        name = item["collection"]
+        text = item.get("text") or name.replace("_", " ").title()
+        return ("collection", name, text, item.get("solo", False))
+
+    if "snap" in item:
+        try:
+            spec = get_snap_spec(item["snap"])
+        except SnapSpecError:
+            return ("error", f"'{item['snap']}'?")
+        idname = "rig.snap_to_ik_with_pole" if spec.pole_bones else "rig.snap_bone_chain"
+        props = [("spec", spec.name)]
+        props.extend((key, item[key]) for key in ("symmetric", "converge", "bake") if key in item)
+        return ("operator", idname, item.get("text") or spec.name, item.get("icon", 'NONE'), tuple(props))
+
+    if "property" in item:
+        name, bone_name = item["property"], item.get("bone", "properties")
+        return ("prop", bone_name, name, f'["{name}"]', item.get("text") or name, item.get("slider", True))
+
+    if "operator" in item:
+        return ("operator", item["operator"], item.get("text"), item.get("icon", 'NONE'),
+                tuple(item.get("props", {}).items()))
+
+    if "draw" in item:
+        drawer = item["draw"]
+        if not callable(drawer):
+            drawer = RIG_UI_DRAWERS.get(drawer)
+            if drawer is None:
+                raise RigUISpecError(f"Unknown rig UI drawer '{item['draw']}'")
+        return ("draw", drawer)
+
+    raise RigUISpecError(f"Rig UI item has no known kind: {item!r}")
+
+def compile_rig_ui(spec):
+    """Compiles every item of a rig UI spec (see the format above) into a RigUIPlan."""
+    rig_ui_plan_stats["compiles"] += 1
+    boxes = []
+    for box in spec.get("boxes", ()):
+        if "id" not in box:
+            raise RigUISpecError(f"Rig UI box '{box.get('text', '')}' has no id")
+        rows = tuple(tuple(_compile_rig_ui_item(item) for item in row) for row in box.get("rows", ()))
+        boxes.append((box["id"], box.get("text", box["id"]), box.get("icon", 'NONE'), box.get("expanded", True), rows))
+    return RigUIPlan(spec, tuple(boxes))
+
+def get_rig_ui_plan(spec):
+    """The cached draw plan of `spec`."""
+    plan = _rig_ui_plans.get(id(spec))
+    if plan is None or plan.spec is not spec:
+        plan = _rig_ui_plans[id(spec)] = compile_rig_ui(spec)
+    return plan
+
+def invalidate_rig_ui_plans():
+    """Drops every compiled plan, e.g. after snap specs were (re)registered."""
+    _rig_ui_plans.clear()
+
+def draw_rig_ui(layout, context, armature_obj, spec):
+    """Replays the cached draw plan of `spec` into `layout`, for `armature_obj`."""
+    rig_ui_plan_stats["draws"] += 1
+    pose_bones = armature_obj.pose.bones
+    for box_id, text, icon, expanded, rows in get_rig_ui_plan(spec).boxes:
+        col = draw_collapsible_box(layout, context, box_id, text, icon=icon, default_expanded=expanded)
+        if not col:
+            continue
+        for steps in rows:
+            row = col.row(align=True)
+            for kind, *args in steps:
+                if kind == "collection":
+                    name, label, solo = args
+                    draw_collection_button(row, name, label, solo, armature_obj=armature_obj)
+                elif kind == "operator":
+                    idname, label, op_icon, props = args
+                    op = row.operator(idname, text=label, icon=op_icon) if label is not None \
+                        else row.operator(idname, icon=op_icon)
+                    for name, value in props:
+                        setattr(op, name, value)
+                elif kind == "prop":
+                    bone_name, name, data_path, label, slider = args
+                    pose_bone = pose_bones.get(bone_name)
+                    if pose_bone is None or name not in pose_bone:
+                        row.label(text=f"'{bone_name}[{name}]'?", icon='ERROR')
+                    else:
+                        row.prop(pose_bone, data_path, text=label, slider=slider)
+                elif kind == "draw":
+                    args[0](row.column())
+                else:
+                    row.label(text=args[0], icon='ERROR')
+
+class RigUIPanel:
+    """
+    Mixin for rig panels drawn from a declarative spec. Subclasses also derive from
+    bpy.types.Panel and set `rig_ui_spec` (and usually `rig_armature_name`, `bl_idname`).
+    """
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'Item'
+    bl_label = "Rig UI"
+
+    rig_armature_name = None  # None shows the panel for any armature
+    rig_ui_spec = None
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return (obj is not None and obj.type == 'ARMATURE' and
+                (cls.rig_armature_name is None or obj.name == cls.rig_armature_name))
+
+    @profiled
+    def draw(self, context):
+        draw_rig_ui(self.layout, context, context.active_object, self.rig_ui_spec)
+
+
+#============================================================
+#  RIG VALIDATION (every name a rig's UI and snaps reference, checked in one pass)
+#============================================================
+class RigIssue:
+    """One problem found by validate_rig. `severity` is 'ERROR' or 'WARNING'."""
+    def __init__(self, severity, category, name, message, source=""):
+        self.severity = severity
+        self.category = category  # 'bone', 'collection', 'property', 'snap', 'pole' or 'constraint'
+        self.name = name
+        self.message = message
+        self.source = source  # where the name is referenced, e.g. "box 'Snapping'"
+
+    def __repr__(self):
+        return f"RigIssue({self.severity}, {self.category}, {self.name!r}: {self.message})"
+
+    def to_dict(self):
+        return {"severity": self.severity, "category": self.category, "name": self.name,
+                "message": self.message, "source": self.source}
+
+class RigValidationReport:
+    def __init__(self, armature_name, issues, counts, elapsed):
+        self.armature_name = armature_name
+        self.issues = issues
+        self.counts = counts  # what was indexed: bones, collections, constraints...
+        self.elapsed = elapsed
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue.severity == 'ERROR']
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def to_dict(self):
+        return {"armature": self.armature_name, "elapsed": self.elapsed, "counts": self.counts,
+                "issues": [issue.to_dict() for issue in self.issues]}
+
+    def summary(self):
+        warnings = len(self.issues) - len(self.errors)
+        return (f"'{self.armature_name}': {len(self.errors)} error(s), {warnings} warning(s) "
+                f"in {self.elapsed * 1e3:.1f} ms")
+
+# Armature name -> last RigValidationReport, shown by draw_validation_section
+rig_validation_reports = {}
+
+def _index_rig(armature_obj, property_bones):
+    """One pass over the armature: bone names, collection names, custom properties and constraint targets."""
+    pose_bones = armature_obj.pose.bones
+    bones = {pbone.name: pbone for pbone in pose_bones}
+    collections = {coll.name for coll in armature_obj.data.collections_all}
+    properties = {name: set(bones[name].keys()) for name in property_bones if name in bones}
+    constraint_targets = []  # (bone, constraint, attribute, subtarget)
+    for pbone in pose_bones:
+        for constraint in pbone.constraints:
+            for target_attr, subtarget_attr in (("target", "subtarget"), ("pole_target", "pole_subtarget")):
+                subtarget = getattr(constraint, subtarget_attr, "")
+                if subtarget and getattr(constraint, target_attr, None) == armature_obj:
+                    constraint_targets.append((pbone.name, constraint.name, subtarget_attr, subtarget))
+    return bones, collections, properties, constraint_targets
+
+def validate_rig(armature_obj, ui_spec=None, snap_specs=()):
+    """
+    Checks everything a rig references against the armature, after indexing it once:
+    the collections, snaps and properties of a rig UI spec, the bones of the named snap specs
+    (plus those the UI uses, mirrored for symmetric buttons), whether IK poles can be placed
+    from the rest pose, and the bone targets of the armature's own constraints.
+    Returns a RigValidationReport, also kept in rig_validation_reports.
+    """
+    start = time.perf_counter()
+    issues = []
+    items = [(box.get("text", box.get("id", "")), item)
+             for box in (ui_spec or {}).get("boxes", ()) for row in box.get("rows", ()) for item in row]
+    property_bones = {item.get("bone", "properties") for _, item in items if "property" in item}
+    bones, collections, properties, constraint_targets = _index_rig(armature_obj, property_bones)
+
+    # --- UI references ---
+    snaps = dict.fromkeys(snap_specs, False)  # spec name -> also check its mirrored side
+    for box_text, item in items:
+        source = f"box '{box_text}'"
+        if "collection" in item and item["collection"] not in collections:
+            issues.append(RigIssue('ERROR', 'collection', item["collection"], "Bone collection not found", source))
+        elif "property" in item:
+            name, bone_name = item["property"], item.get("bone", "properties")
+            if bone_name not in bones:
+                issues.append(RigIssue('ERROR', 'bone', bone_name, f"Property bone for '{name}' not found", source))
+            elif name not in properties[bone_name]:
+                issues.append(RigIssue('ERROR', 'property', name, f"No custom property on '{bone_name}'", source))
+        elif "snap" in item:
+            snaps[item["snap"]] = snaps.get(item["snap"], False) or item.get("symmetric", False)
+
+    # --- Snap specs ---
+    # Buttons often share specs (plain and symmetric, or .L mirrored onto the registered .R),
+    # so each missing bone and each pole chain is only reported once.
+    missing_bones, pole_chains = set(), {}
+    mirror_map_rebuilt = False
+
+    def check_bones(spec, name):
+        missing = [bone for bone in dict.fromkeys(spec.bone_names) if bone not in bones]
+        for bone in missing:
+            if bone not in missing_bones:
+                missing_bones.add(bone)
+                issues.append(RigIssue('ERROR', 'bone', bone, "Bone not found", f"snap '{name}'"))
+        if not missing and spec.pole_bones:
+            pole_chains.setdefault(spec.pole_bones, name)
+        return not missing
+
+    for name, symmetric in snaps.items():
+        spec = _snap_specs.get(name)
+        if spec is None:
+            issues.append(RigIssue('ERROR', 'snap', name, "Snap spec not registered"))
+            continue
+        if not check_bones(spec, name) or not symmetric:
+            continue
+        try:
+            mirrored = _mirror_snap_spec(spec, armature_obj, rebuild=not mirror_map_rebuilt)
+        except SnapSpecError as err:
+            issues.append(RigIssue('ERROR', 'snap', name, str(err)))
+            continue
+        finally:
+            mirror_map_rebuilt = True
+        check_bones(mirrored, f"{name} (mirrored)")
+
+    # --- Poles: a chain that is straight at rest has no bend direction to place the pole from ---
+    if pole_chains:
+        import numpy as np
+        from rigging_core import pole_positions
+        heads = np.array([[bones[bone].bone.head_local for bone in pole_bones[1:]] for pole_bones in pole_chains])
+        _, degenerate = pole_positions(heads[:, 0], heads[:, 1], heads[:, 2])
+        for (pole_bones, name), straight in zip(pole_chains.items(), degenerate):
+            if straight:
+                issues.append(RigIssue('WARNING', 'pole', pole_bones[0],
+                                       f"Chain {' > '.join(pole_bones[1:])} is straight at rest, "
+                                       f"the pole can't be placed", f"snap '{name}'"))
+
+    # --- Constraints pointing at bones of this armature ---
+    for bone, constraint, attr, subtarget in constraint_targets:
+        if subtarget not in bones:
+            issues.append(RigIssue('ERROR', 'constraint', subtarget, f"'{constraint}' {attr} not found",
+                                   f"bone '{bone}'"))
+
+    counts = {"bones": len(bones), "collections": len(collections), "constraint_targets": len(constraint_targets),
+              "ui_items": len(items), "snaps": len(snaps)}
+    report = RigValidationReport(armature_obj.name, issues, counts, time.perf_counter() - start)
+    rig_validation_reports[armature_obj.name] = report
+    return report
+
+def _rig_ui_panels_for(armature_obj):
+    """The registered RigUIPanel subclasses drawn for this armature."""
+    return [cls for cls in RigUIPanel.__subclasses__()
+            if getattr(cls, "is_registered", False) and cls.rig_ui_spec is not None
+            and cls.rig_armature_name in (None, armature_obj.name)]
+
+def validate_rig_panels(armature_obj):
+    """validate_rig with the UI specs of every registered rig panel showing this armature."""
+    panels = _rig_ui_panels_for(armature_obj)
+    spec = {"boxes": [box for cls in panels for box in cls.rig_ui_spec.get("boxes", ())]}
+    return validate_rig(armature_obj, spec)
+
+@persistent
+def _validate_rigs_on_load(*args):
+    """Validates the armatures that have a rig panel as soon as a file is loaded, and prints any problem."""
+    rig_validation_reports.clear()
+    names = {cls.rig_armature_name for cls in RigUIPanel.__subclasses__()
+             if getattr(cls, "is_registered", False) and cls.rig_armature_name}
+    for name in names:
+        armature_obj = bpy.data.objects.get(name)
+        if armature_obj is None or armature_obj.type != 'ARMATURE':
+            continue
+        report = validate_rig_panels(armature_obj)
+        if report.issues:
+            print(f"Rig validation: {report.summary()}")
+            for issue in report.issues:
+                print(f"  {issue.severity}: {issue.category} '{issue.name}': {issue.message} {issue.source}".rstrip())
+
+def draw_validation_section(layout):
+    """The last validation result of the active armature, with a button to run it again."""
+    rig = bpy.context.active_object
+    if not (rig and rig.type == 'ARMATURE'):
+        return
+    layout.operator("rig.validate_rig", icon='CHECKMARK')
+    report = rig_validation_reports.get(rig.name)
+    if report is None:
+        return
+    col = layout.column(align=True)
+    col.label(text=report.summary(), icon='CHECKMARK' if report.ok else 'ERROR')
+    for issue in report.issues:
+        col.label(text=f"{issue.category} '{issue.name}': {issue.message}",
+                  icon='ERROR' if issue.severity == 'ERROR' else 'INFO')
+
+RIG_UI_DRAWERS["validation"] = draw_validation_section
+
 #============================================================
 #  REGISTRATION
 #============================================================
 
-# Add all the classes that need to be registered to this list
-classes = (
+# Classes backing data saved in .blend files, registered even without a UI
+data_classes = (
+    RigVisibilityPresetEntry,
+    RigVisibilityPreset,
+)
+
+# Operators, UI state and debug tools, only registered when a UI can use them
+ui_classes = (
     RIG_OT_snap_bone_chain,
     RIG_OT_snap_to_ik_with_pole,
+    RIG_OT_batch_snap,
+    RIG_OT_apply_visibility_preset,
+    RIG_OT_capture_visibility_preset,
+    RIG_OT_remove_visibility_preset,
+    RIG_OT_validate_rig,
     DEBUG_OT_dissect_bone_matrix,
+    DEBUG_OT_dump_rig_transforms,
+    DEBUG_OT_toggle_profiling,
+    DEBUG_OT_toggle_source_matrix_cache,
+    DEBUG_OT_clear_profile,
+    DEBUG_OT_export_profile,
     RigUIStateItem,
     RigUIStateManager,
     WM_OT_RigUIToggleBox,
 )
 
-def register():
+classes = data_classes + ui_classes
+
+# What register() actually registered, so unregister() undoes exactly that
+_registered_classes = ()
 
-    for cls in classes:
+def _reload_handlers():
+    return (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post)
+
+def register(ui=None):
+    """
+    Registers the add-on. Without a UI (`blender --background`, e.g. on render and farm nodes) only
+    the data classes are registered; the snapping and math functions work either way.
+    Pass `ui` to override the detection.
+    """
+    global _registered_classes
+    if ui is None:
+        ui = not bpy.app.background
+    _registered_classes = classes if ui else data_classes
+
+    for cls in _registered_classes:
         bpy.utils.register_class(cls)
 
-    # Add a POINTER to our State Manager class on Blender's Window Manager.
-    # This creates a single, global instance of our state manager.
-    bpy.types.WindowManager.rig_ui_state = bpy.props.PointerProperty(type=RigUIStateManager)        
+    # Visibility presets travel with the armature data, so they are saved with the rig.
+    bpy.types.Armature.rig_visibility_presets = bpy.props.CollectionProperty(type=RigVisibilityPreset)
+    if ui:
+        # Add a POINTER to our State Manager class on Blender's Window Manager.
+        # This creates a single, global instance of our state manager.
+        bpy.types.WindowManager.rig_ui_state = bpy.props.PointerProperty(type=RigUIStateManager)        
 
+    for handlers in _reload_handlers():
+        handlers.append(_on_rig_data_reloaded)
+    bpy.app.handlers.depsgraph_update_post.append(_on_armature_updated)
+    if ui:
+        bpy.app.handlers.load_post.append(_validate_rigs_on_load)
 
 
     addon_name = bl_info.get("name", "Unknown Addon")
     version_tuple = bl_info.get("version", (0, 0, 0))
     version_string = ".".join(map(str, version_tuple))
 
-    print(f"{addon_name} (v{version_string}) loaded successfully.")
+    print(f"{addon_name} (v{version_string}) loaded successfully{'' if ui else ' (no UI)'}.")
 
 def unregister():
 
-    del bpy.types.WindowManager.rig_ui_state
+    enable_profiling(False)
+    enable_source_matrix_cache(False)
+    for handlers in _reload_handlers():
+        if _on_rig_data_reloaded in handlers:
+            handlers.remove(_on_rig_data_reloaded)
+    if _on_armature_updated in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_armature_updated)
+    if _validate_rigs_on_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_validate_rigs_on_load)
+    invalidate_collection_index()
+    invalidate_rig_ui_plans()
+
+    if RigUIStateManager in _registered_classes:
+        del bpy.types.WindowManager.rig_ui_state
+    del bpy.types.Armature.rig_visibility_presets
     
-    for cls in reversed(classes):
+    for cls in reversed(_registered_classes):
         bpy.utils.unregister_class(cls)
 
     addon_name = bl_info.get("name", "Unknown Addon")
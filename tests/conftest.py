@@ -0,0 +1,25 @@
+# The add-on modules live at the repository root, next to this folder.
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _rotation(axis, angle):
+    axis = np.asarray(axis, dtype=np.float64) / np.linalg.norm(axis)
+    matrix = np.eye(4)
+    x, y, z = axis
+    c, s, t = np.cos(angle), np.sin(angle), 1.0 - np.cos(angle)
+    matrix[:3, :3] = [[t * x * x + c, t * x * y - s * z, t * x * z + s * y],
+                      [t * x * y + s * z, t * y * y + c, t * y * z - s * x],
+                      [t * x * z - s * y, t * y * z + s * x, t * z * z + c]]
+    return matrix
+
+
+@pytest.fixture
+def rotation():
+    """rotation(axis, angle) -> 4x4 rotation matrix about `axis`."""
+    return _rotation
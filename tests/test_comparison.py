@@ -0,0 +1,36 @@
+# Batched transform comparison, used to skip snapping bones that are already in place.
+import numpy as np
+import pytest
+
+from rigging_core import transforms_match_batch
+
+
+@pytest.mark.parametrize("count", (10, 1000, 100000))
+def test_transforms_match_batch(benchmark, rotation, count):
+    rng = np.random.default_rng(count)
+    mats = np.tile(np.eye(4), (count, 1, 1))
+    mats[:, :3, 3] = rng.uniform(-1.0, 1.0, size=(count, 3))
+    moved = mats.copy()
+    shifted = np.arange(count) % 3 == 1
+    rotated = np.arange(count) % 3 == 2
+    moved[shifted, 0, 3] += 0.001
+    moved[rotated] = moved[rotated] @ rotation([0.0, 0.0, 1.0], 0.001)
+
+    match = benchmark(transforms_match_batch, mats, moved)
+    assert match.tolist() == (~(shifted | rotated)).tolist()
+    assert transforms_match_batch(mats, moved, location_tolerance=0.01, rotation_tolerance=0.01).all()
+
+
+def test_transforms_match_batch_small_angles_in_float32(rotation):
+    mats = np.tile(np.eye(4, dtype=np.float32), (2, 1, 1))
+    rotated = mats.copy()
+    rotated[0] = rotation([1.0, 1.0, 0.0], 0.00005)
+    rotated[1] = rotation([1.0, 1.0, 0.0], 0.0005)
+    assert transforms_match_batch(mats, rotated.astype(np.float32)).tolist() == [True, False]
+
+
+def test_transforms_match_batch_scale():
+    mats = np.tile(np.eye(4), (2, 1, 1))
+    scaled = mats.copy()
+    scaled[1, :3, :3] *= 1.01
+    assert transforms_match_batch(mats, scaled).tolist() == [True, False]
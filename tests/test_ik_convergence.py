@@ -0,0 +1,10 @@
+# Convergence of the iterative FK -> IK snap on synthetic two-bone limbs.
+import rigging_core
+
+
+def test_ik_convergence(benchmark):
+    result = benchmark.pedantic(rigging_core.benchmark_ik_convergence, kwargs={"limb_count": 200},
+                                rounds=1, iterations=1)
+    assert result["converged"] == result["limbs"]
+    assert result["max_iterations"] <= 10
+    assert result["mean_iterations"] < 6
@@ -0,0 +1,20 @@
+# Opposite-side bone names, used to mirror snap specs.
+import pytest
+
+from rigging_core import mirror_name
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("hand_ik.L", "hand_ik.R"),
+    ("hand_ik.R", "hand_ik.L"),
+    ("leg_fk_L", "leg_fk_R"),
+    ("thumb.l", "thumb.r"),
+    ("arm.L.001", "arm.R.001"),
+    ("tail_01_ik", None),
+    ("properties", None),
+    ("LEFT", None),
+])
+def test_mirror_name(name, expected):
+    assert mirror_name(name) == expected
+    if expected is not None:
+        assert mirror_name(expected) == name
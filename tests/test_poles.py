@@ -0,0 +1,50 @@
+# Batched pole placement (rigging_core.pole_positions) and the location keys baked from it.
+import numpy as np
+import pytest
+
+from rigging_core import pole_position, pole_positions, pose_to_location
+
+
+@pytest.mark.parametrize("count", (10, 1000, 100000))
+def test_pole_positions_batch_matches_single(benchmark, count):
+    rng = np.random.default_rng(count)
+    roots, pivots, ends = (rng.uniform(-1.0, 1.0, size=(count, 3)) for _ in range(3))
+    positions, degenerate = benchmark(pole_positions, roots, pivots, ends)
+
+    assert positions.shape == (count, 3)
+    assert not degenerate.any()
+    for i in range(min(count, 100)):
+        assert np.allclose(positions[i], pole_position(roots[i], pivots[i], ends[i]))
+    # The pole lies in the chain's plane, one root-pivot length away from the pivot
+    assert np.allclose(np.linalg.norm(positions - pivots, axis=1), np.linalg.norm(pivots - roots, axis=1))
+    normals = np.cross(pivots - roots, ends - roots)
+    assert np.abs(np.einsum('ij,ij->i', positions - roots, normals)).max() < 1e-9
+
+
+def test_pole_positions_straight_chain_fallbacks():
+    roots = np.zeros((3, 3))
+    pivots = np.array([[0.0, 1.0, 0.0], [0.0, 1.0, 0.0], [0.0, 1.0, 0.0]])
+    ends = np.array([[0.0, 2.0, 1.0], [0.0, 2.0, 0.0], [0.0, 2.0, 0.0]])
+
+    positions, degenerate = pole_positions(roots, pivots, ends)
+    assert degenerate.tolist() == [False, True, True]
+    assert np.allclose(positions[1:], pivots[1:])
+
+    held, _ = pole_positions(roots, pivots, ends, fallback='hold')
+    assert np.allclose(held[1] - pivots[1], held[0] - pivots[0])
+
+    directed, _ = pole_positions(roots, pivots, ends, fallback=[1.0, 0.0, 0.0])
+    assert np.allclose(directed[1:], pivots[1:] + [1.0, 0.0, 0.0])
+
+
+def test_pose_to_location_inverts_the_pose_translation(rotation):
+    rng = np.random.default_rng(0)
+    rest, parent_rest = rotation([1.0, 2.0, 3.0], 0.7), rotation([0.0, 1.0, 0.0], 1.2)
+    rest[:3, 3], parent_rest[:3, 3] = [0.0, 1.0, 0.5], [0.2, 0.0, 0.0]
+    parent_poses = np.array([rotation(rng.uniform(-1.0, 1.0, 3), angle) for angle in (0.1, 0.5, 2.0)])
+    locations = rng.uniform(-1.0, 1.0, size=(3, 3))
+
+    origins = parent_poses @ np.linalg.inv(parent_rest) @ rest
+    translations = (origins @ np.append(locations, np.ones((3, 1)), axis=1)[..., None])[:, :3, 0]
+    assert np.allclose(pose_to_location(translations, rest, parent_poses, parent_rest), locations)
+    assert np.allclose(pose_to_location(rest[:3, 3], rest), [[0.0, 0.0, 0.0]])
@@ -0,0 +1,32 @@
+# Throughput and accuracy of the bpy-free rigging math, tracked with pytest-benchmark
+# (python -m pip install -r requirements-dev.txt):
+#   python -m pytest tests --benchmark-autosave
+# and compared between runs with `--benchmark-compare --benchmark-compare-fail=mean:25%`.
+import numpy as np
+import pytest
+
+from rigging_core import (forward_kinematics, make_synthetic_rig, matrices_fuzzy_equal_batch, snap_matrix,
+                          snap_synthetic_chains)
+
+BONE_COUNTS = (10, 1000, 100000)
+SEEDS = (0, 1, 2)
+
+
+#============================================================
+#  SNAPPING
+#============================================================
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("bone_count", BONE_COUNTS)
+def test_snap_synthetic_chains(benchmark, bone_count, seed):
+    rig = make_synthetic_rig(bone_count, seed=seed)
+    pose = rig.pose()
+    basis = benchmark(snap_synthetic_chains, rig, pose)
+
+    # Re-evaluate the hierarchy: every target must sit on its source plus the rest offset
+    new_pose = forward_kinematics(rig.parents, rig.rest, basis)
+    src, tgt = rig.source_indices, rig.target_indices
+    expected = snap_matrix(pose[src], rig.rest[src], rig.rest[tgt])
+    assert np.abs(new_pose[tgt] - expected).max() < 1e-9
+    assert matrices_fuzzy_equal_batch(new_pose[tgt], expected).sum() == len(tgt)
+    # Sources are left alone
+    assert np.array_equal(basis[src], rig.basis[src])
@@ -0,0 +1,73 @@
+# Streamed transform dumps: writing, reading back and diffing two of them.
+import numpy as np
+import pytest
+
+from rigging_core import DUMP_FIELDS, TransformDumpWriter, diff_transform_dumps, read_transform_dump
+
+
+def _write_dump(path, bone_names, frames, records, rest):
+    with TransformDumpWriter(path, bone_names, frames, rest, armature_name="rig") as writer:
+        for frame_records in records:
+            writer.write_frame(frame_records)
+
+
+def _record_size():
+    return sum(size for _, size in DUMP_FIELDS)
+
+
+@pytest.mark.parametrize("bone_count", (10, 1000))
+def test_dump_round_trip(benchmark, tmp_path, bone_count):
+    rng = np.random.default_rng(bone_count)
+    bones = [f"bone_{i}" for i in range(bone_count)]
+    frames = list(range(1, 25))
+    records = rng.normal(size=(len(frames), bone_count, _record_size())).astype(np.float32)
+    rest = rng.normal(size=(bone_count, 4, 4)).astype(np.float32)
+    path = str(tmp_path / "a.rigdump")
+
+    benchmark(_write_dump, path, bones, frames, records, rest)
+    dump = read_transform_dump(path)
+    assert dump.armature_name == "rig"
+    assert dump.bone_names == bones
+    assert dump.frames == frames
+    assert np.array_equal(dump.rest, rest)
+    assert np.array_equal(dump.data, records)
+    matrix_world = dump.field("matrix_world")
+    assert matrix_world.shape == (len(frames), bone_count, 4, 4)
+    assert np.array_equal(matrix_world[3, 7].ravel(), records[3, 7, -16:])
+
+
+def test_dump_diff(tmp_path):
+    rng = np.random.default_rng(0)
+    bones = ["root", "arm.L", "hand.L"]
+    frames = list(range(10))
+    records = rng.normal(size=(len(frames), len(bones), _record_size())).astype(np.float32)
+    rest = np.tile(np.eye(4, dtype=np.float32), (len(bones), 1, 1))
+    _write_dump(str(tmp_path / "a.rigdump"), bones, frames, records, rest)
+
+    drifted = records.copy()
+    drifted[6, 1, -13] += 0.5  # x translation of arm.L's world matrix on frame 6
+    _write_dump(str(tmp_path / "b.rigdump"), bones + ["extra"], frames[2:],
+                np.concatenate([drifted[2:], np.zeros((len(frames) - 2, 1, _record_size()), np.float32)], axis=1),
+                np.tile(np.eye(4, dtype=np.float32), (len(bones) + 1, 1, 1)))
+
+    report = diff_transform_dumps(read_transform_dump(str(tmp_path / "a.rigdump")),
+                                  read_transform_dump(str(tmp_path / "b.rigdump")))
+    assert report["frames_compared"] == len(frames) - 2
+    assert report["bones_compared"] == len(bones)
+    assert [drift["bone"] for drift in report["drifting"]] == ["arm.L"]
+    drift = report["drifting"][0]
+    assert drift["worst_frame"] == 6
+    assert drift["max_translation"] == pytest.approx(0.5, abs=1e-6)
+    assert report["only_in_a"] == []
+    assert report["only_in_b"] == ["extra"]
+
+
+def test_dump_diff_identical(tmp_path):
+    rng = np.random.default_rng(1)
+    records = rng.normal(size=(5, 4, _record_size())).astype(np.float32)
+    rest = np.tile(np.eye(4, dtype=np.float32), (4, 1, 1))
+    bones = [f"b{i}" for i in range(4)]
+    _write_dump(str(tmp_path / "a.rigdump"), bones, range(5), records, rest)
+    dump = read_transform_dump(str(tmp_path / "a.rigdump"))
+    report = diff_transform_dumps(dump, dump, chunk_frames=2)
+    assert report["drifting"] == [] and report["frames_compared"] == 5